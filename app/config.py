@@ -1,16 +1,39 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 
 class Config(BaseSettings):
     streamlit_title: Optional[str] = "VideoLabelMagic"
     debug: Optional[bool] = False
+    preview_interval: Optional[float] = 0.5  # Seconds between debug previews
+    preview_buffer_size: Optional[int] = 8  # Number of recent debug previews shown
     models_directory: Optional[str] = "models/"
     output_directory: Optional[str] = "outputs/"
     object_class_directory: Optional[str] = "object_class/"
+    temp_directory: Optional[str] = "temp"
+    temp_max_bytes: Optional[int] = 0  # Cap on temp disk used by uploads and downloads of all sessions, 0 disables it
+    upload_chunk_size: Optional[int] = 8 * 1024 * 1024
     default_frame_rate: Optional[float] = 1.0
 
+    # Motion-adaptive sampling settings
+    adaptive_sampling: Optional[bool] = False
+    adaptive_min_rate: Optional[float] = 0.2  # Frames per second during static periods
+    adaptive_max_rate: Optional[float] = 5.0  # Frames per second during activity
+    adaptive_frame_budget: Optional[int] = 0  # Maximum sampled frames per video, 0 for no budget
+    adaptive_motion_threshold: Optional[float] = 12.0  # Mean pixel difference treated as full activity
+
+    # Output format settings
+    coco_shard_size: Optional[int] = 0  # Images per COCO JSON file, 0 writes a single file
+    tar_shard_max_bytes: Optional[int] = 512 * 1024 * 1024
+    tar_shard_max_samples: Optional[int] = 10000
+
+    # Live stream settings
+    live_queue_size: Optional[int] = 4
+    live_drop_policy: Optional[str] = 'drop_oldest'  # 'drop_oldest' or 'drop_while_busy'
+    live_window_seconds: Optional[float] = 300.0  # Rotate output datasets every N seconds, 0 disables rotation
+    live_max_duration: Optional[float] = 60.0
+
     # Object storage settings
     storage_use_s3: Optional[bool] = False
     s3_endpoint_url: Optional[str] = ""
@@ -18,6 +41,10 @@ class Config(BaseSettings):
     s3_secret_key: Optional[str] = ""
     s3_bucket_name: Optional[str] = ""
     s3_region_name: Optional[str] = ""
+    storage_sync_enabled: Optional[bool] = False  # Upload only new or changed objects
+    storage_sync_delete: Optional[bool] = False  # Delete previously synced objects that no longer exist locally
+    storage_sync_dedupe_images: Optional[bool] = False  # Replace images/ with content-hash refs (image_refs.json)
+    storage_sync_manifest: Optional[str] = "outputs/.sync_manifest.json"
 
     # SAHI settings
     sahi_enabled: Optional[bool] = False
@@ -25,6 +52,23 @@ class Config(BaseSettings):
     sahi_device: Optional[str] = 'cpu'
     sahi_slice_size: Optional[Tuple[int, int]] = (256, 256)
     sahi_overlap_ratio: Optional[Tuple[float, float]] = (0.2, 0.2)
+    sahi_adaptive: Optional[bool] = False
+    sahi_texture_threshold: Optional[float] = 8.0
+    sahi_motion_threshold: Optional[float] = 6.0
+
+    # Inference runtime settings
+    inference_runtime: Optional[str] = 'pytorch'  # 'pytorch', 'onnx' or 'openvino'
+    inference_precision: Optional[str] = 'fp32'  # 'fp32', 'fp16' or 'int8'
+    inference_dynamic_batch: Optional[bool] = False
+    inference_compare_frames: Optional[int] = 20
+    inference_calibration_data: Optional[str] = ""  # Dataset YAML for OpenVINO INT8 calibration
+
+    # Inference resolution settings
+    model_imgsz: Optional[Dict[str, int]] = {}  # Per model file, e.g. "yolov8n.pt:640,rtdetr-l.pt:960"
+    imgsz_auto_tune: Optional[bool] = False
+    imgsz_candidates: Optional[Tuple[int, ...]] = (320, 480, 640, 960, 1280)
+    imgsz_calibration_frames: Optional[int] = 8
+    imgsz_tolerance: Optional[float] = 0.9  # Minimum F1 against the highest resolution
 
     # Use field_validator for Pydantic v2
     @field_validator("sahi_slice_size", mode='before')
@@ -39,6 +83,19 @@ class Config(BaseSettings):
             return tuple(map(float, v.split(',')))
         return v
 
+    @field_validator("model_imgsz", mode='before')
+    def parse_model_imgsz(cls, v):
+        if isinstance(v, str):
+            return {name.strip(): int(size) for name, size in
+                    (item.rsplit(':', 1) for item in v.split(',') if item.strip())}
+        return v
+
+    @field_validator("imgsz_candidates", mode='before')
+    def parse_imgsz_candidates(cls, v):
+        if isinstance(v, str):
+            return tuple(map(int, v.split(',')))
+        return v
+
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
@@ -1,10 +1,15 @@
 import cv2
+import json
 import os
 import torch  # Import torch to check for CUDA availability
 import yaml
 
 from ultralytics import YOLO, RTDETR, NAS
-from utils.image_processor import ImageProcessor
+from utils.frame_sampler import MotionAdaptiveSampler
+from utils.image_processor import ImageProcessor, TransformPipeline
+from utils.inference_runtime import InferenceRuntime
+from utils.preview_renderer import PreviewRenderer
+from utils.resolution_controller import ResolutionController
 from utils.sahi_utils import SahiUtils
 
 
@@ -14,10 +19,15 @@ class VideoFrameExtractor:
     and annotates them using YOLO model predictions, with options to save locally or to object storage.
     """
 
+    MODEL_CLASSES = {"RTDETR": RTDETR, "YOLO": YOLO, "NAS": NAS}
+    # NAS only loads .pt checkpoints, so ONNX/OpenVINO exports are limited to these model types
+    EXPORTABLE_MODEL_TYPES = ('YOLO', 'RTDETR')
+
     def __init__(self, config, video_path, frame_rate, output_dir, model_path, class_config_path, output_format,
-                 transformations, model_types, sahi_config=None):
+                 transformations, model_types, sahi_config=None, frame_prefix=None):
         self.config = config
         self.video_path = video_path  # Ensure this is a string representing the path to the video file.
+        self.frame_prefix = frame_prefix  # Overrides the video basename in frame filenames
         self.frame_rate = frame_rate
         self.output_dir = output_dir
 
@@ -29,9 +39,21 @@ class VideoFrameExtractor:
         self.supported_classes_ids = self.load_classes_ids(self.class_config_path)
         self.supported_classes_map = self.load_classes_category_map(self.class_config_path)
 
+        # Inference resolution per model; None keeps the model's default imgsz
+        self.imgsz = (self.config.model_imgsz or {}).get(model_path)
+        self.resolution_report = None
+
+        self.inference_runtime = InferenceRuntime(self.config.inference_runtime, self.config.inference_precision,
+                                                  self.config.inference_dynamic_batch, self.imgsz or 640,
+                                                  self.config.inference_calibration_data)
+        self.weights_path = os.path.join('models', model_path)
+        self.model_types = model_types
         self.vision_model = self.get_given_model(model_path, model_types)
 
         self.image_processor = ImageProcessor(output_size=self.transformations.get('size', (640, 640)))
+        self.transform_pipeline = TransformPipeline(self.image_processor, self.transformations)
+        self.memory_stats = None
+        self.sampler = None
 
         # Set the device (CUDA or CPU)
         # Ensure CUDA is available
@@ -47,6 +69,27 @@ class VideoFrameExtractor:
         else:
             self.sahi_utils = None
 
+        self.validate_source()
+
+        # Debug previews are rendered off the extraction loop; set preview_callback to receive them.
+        # The render thread is started by extract_frames, which also closes it.
+        self.preview = None
+        self.preview_callback = None
+        self.preview_version = 0
+
+    def start_preview(self):
+        """
+        Start the debug preview render thread. Call it inside the try block whose finally closes `self.preview`.
+        """
+        if self.config.debug and self.preview is None:
+            self.preview = PreviewRenderer(
+                lambda results: list(self.output_format.iter_detections(results, self.supported_classes_ids)),
+                self.supported_classes_map, self.config.preview_interval, self.config.preview_buffer_size)
+
+    def validate_source(self):
+        """
+        Ensure the video source exists before extraction starts.
+        """
         # Debugging output to ensure path handling
         if not os.path.exists(self.video_path):
             raise FileNotFoundError(f"The specified video file was not found at {self.video_path}")
@@ -54,19 +97,86 @@ class VideoFrameExtractor:
             print(f"VideoFrameExtractor initialized with video path: {self.video_path}")
 
     def get_given_model(self, model_path, types):
+        if self.inference_runtime.enabled and types not in self.EXPORTABLE_MODEL_TYPES:
+            raise ValueError(f"The {self.inference_runtime.runtime} runtime is not supported for {types} models; "
+                             f"use pytorch or one of {self.EXPORTABLE_MODEL_TYPES}.")
+        weights_path = os.path.join('models', model_path)
         try:
-            if types == "RTDETR":
-                model = RTDETR(os.path.join('models', model_path))
-                return model
-            elif types == "YOLO":
-                model = YOLO(os.path.join('models', model_path))
-                return model
-            elif types == "NAS":
-                model = NAS(os.path.join('models', model_path))
-                return model
+            model = self.MODEL_CLASSES[types](weights_path)
         except Exception as e:
             raise ValueError(f"Model architecture and Model not Matching:  {str(e)}")
 
+        if not self.inference_runtime.enabled:
+            return model
+
+        try:
+            exported_path = self.inference_runtime.export(model, weights_path)
+            # The PyTorch model is released here; compare_runtime loads it again only when asked
+            return self.MODEL_CLASSES[types](exported_path)
+        except Exception as e:
+            raise ValueError(f"Failed to prepare {self.inference_runtime.runtime} runtime for {model_path}: {str(e)}")
+
+    def compare_runtime(self, model_confidence):
+        """
+        Compares the exported runtime against the PyTorch checkpoint on a sample clip of the video.
+        The checkpoint is loaded only for the comparison, so exported runs keep a single model in memory.
+        Returns a dictionary with per-frame latency, speedup and detection agreement.
+        """
+        if not self.inference_runtime.enabled:
+            raise ValueError("Runtime comparison requires an ONNX or OpenVINO inference runtime.")
+        frames = InferenceRuntime.read_sample_frames(self.video_path, self.config.inference_compare_frames)
+        predict_kwargs = self.get_predict_kwargs(model_confidence)
+        pytorch_model = self.MODEL_CLASSES[self.model_types](self.weights_path)
+        report = InferenceRuntime.compare(pytorch_model, self.vision_model, frames, predict_kwargs)
+        report['runtime'] = self.inference_runtime.runtime
+        report['precision'] = self.inference_runtime.precision
+        return report
+
+    def get_predict_kwargs(self, model_confidence):
+        """
+        Keyword arguments for `predict`, including `imgsz` only when a resolution is configured or tuned.
+        """
+        predict_kwargs = {'conf': model_confidence, 'classes': self.supported_classes_ids, 'device': self.device}
+        if self.imgsz:
+            predict_kwargs['imgsz'] = self.imgsz
+        return predict_kwargs
+
+    def tune_resolution(self, model_confidence, frame_interval):
+        """
+        Calibrate the inference resolution on the first sampled frames and keep the smallest resolution whose
+        detections match the highest resolution within the configured tolerance. The report is written to
+        `inference_resolution.json` in the output directory. Without calibration frames the configured or
+        default resolution is kept.
+        """
+        if self.inference_runtime.enabled and not self.inference_runtime.dynamic:
+            print("Skipping resolution auto-tune: the exported model has a static input size.")
+            return
+
+        cap = cv2.VideoCapture(self.video_path)
+        frames, frame_count = [], 0
+        while len(frames) < self.config.imgsz_calibration_frames and cap.grab():
+            if frame_count % frame_interval == 0:
+                frame = self.transform_pipeline.retrieve(cap)
+                if frame is not None:
+                    # Pooled buffers are overwritten by the next frame, so keep copies
+                    frames.append(next(iter(self.apply_transformations(frame).values())).copy())
+            frame_count += 1
+        cap.release()
+        if not frames:
+            # E.g. IMGSZ_CALIBRATION_FRAMES=0 or a clip shorter than the sampling interval
+            print(f"Skipping resolution auto-tune: no calibration frames, keeping imgsz {self.imgsz or 'default'}.")
+            return
+
+        predict_kwargs = self.get_predict_kwargs(model_confidence)
+        predict_kwargs.pop('imgsz', None)
+        controller = ResolutionController(self.config.imgsz_candidates, self.config.imgsz_tolerance)
+        self.resolution_report = controller.calibrate(self.vision_model, frames, predict_kwargs)
+        self.imgsz = self.resolution_report['chosen_imgsz']
+        with open(os.path.join(self.output_dir, 'inference_resolution.json'), 'w') as file:
+            json.dump(self.resolution_report, file, indent=2)
+        print(f"Inference resolution set to {self.imgsz} "
+              f"({self.resolution_report['speedup']}x faster than {self.resolution_report['reference_imgsz']})")
+
     def load_classes_names(self, config_path):
         """
         Load classes from a YAML configuration file.
@@ -102,78 +212,113 @@ class VideoFrameExtractor:
 
     def extract_frames(self, model_confidence):
         cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Failed to open video stream for {self.video_path}")
-
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = max(1, int(video_fps / self.frame_rate))
-        frame_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_count % frame_interval == 0:
-                transformed_images = self.apply_transformations(frame)
-
-                for key, transformed_image in transformed_images.items():
-                    if transformed_image.ndim == 2:  # Grayscale to RGB for consistency
-                        transformed_image = cv2.cvtColor(transformed_image, cv2.COLOR_GRAY2BGR)
-
-                    frame_filename = f"{self._get_video_basename()}_image{frame_count}_{key}.jpg"
-                    frame_path = os.path.join(self.output_dir, 'images', frame_filename)
-
-                    cv2.imwrite(frame_path, transformed_image)
-                    # success = cv2.imwrite(frame_path, transformed_image)
-                    # if not success and self.config.debug:
-                    #     print(f"Failed to write image to {frame_path}")
-                    #     continue  # Skip further processing for this frame
-                    if self.sahi_utils:
-                        results = self.sahi_utils.perform_sliced_inference(transformed_image)
-                    else:
-                        if self.config.debug:
-                            results = self.vision_model.predict(transformed_image, conf=model_confidence, verbose=False,
-                                                                classes=self.supported_classes_ids, device=self.device)
-                            # will add image show later time
-                        else:
-                            results = self.vision_model.predict(transformed_image, conf=model_confidence, verbose=False,
-                                                                classes=self.supported_classes_ids, device=self.device)
-
-                    # print(results)
-
-                    self.output_format.save_annotations(transformed_image, frame_path, frame_filename,
-                                                        results,
-                                                        self.supported_classes_names, self.supported_classes_ids)
-
-            frame_count += 1
-
-        cap.release()
+        try:
+            if not cap.isOpened():
+                raise ValueError(f"Failed to open video stream for {self.video_path}")
+            self.start_preview()
+
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_interval = max(1, int(video_fps / self.frame_rate))
+            frame_count = 0
+            if self.config.adaptive_sampling:
+                self.sampler = MotionAdaptiveSampler(
+                    video_fps, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), self.config.adaptive_min_rate,
+                    self.config.adaptive_max_rate, self.config.adaptive_frame_budget,
+                    self.config.adaptive_motion_threshold)
+
+            # SAHI slices at its own resolution, so imgsz only applies to full-frame inference
+            if self.config.imgsz_auto_tune and not self.sahi_utils:
+                self.tune_resolution(model_confidence, frame_interval)
+
+            # grab() advances without converting the frame; only sampled frames are retrieved into the pool
+            while cap.grab():
+                frame = self.select_frame(cap, frame_count, frame_interval)
+                if frame is not None:
+                    self.process_frame(frame, frame_count, model_confidence)
+                    self.publish_preview()
+                frame_count += 1
+        finally:
+            cap.release()
+            # Stop the render thread also when extraction fails
+            if self.preview:
+                self.preview.close()
+                self.publish_preview()
+
+        if self.sampler:
+            self.sampler.save(os.path.join(self.output_dir, 'sampling_decisions.json'))
+            print(f"Adaptive sampling: {self.sampler.summary()}")
+        self.memory_stats = self.transform_pipeline.memory_stats()
+        if self.config.debug:
+            print(f"Frame buffer stats: {self.memory_stats}")
+
+    def select_frame(self, cap, frame_count, frame_interval):
+        """
+        Retrieve the grabbed frame if it is sampled, either by the adaptive sampler or at the fixed interval.
+        Returns None for frames that are skipped.
+        """
+        if self.sampler:
+            # Probe frames are decoded to score motion; only the sampled ones go through inference
+            if not self.sampler.should_probe(frame_count):
+                return None
+            frame = self.transform_pipeline.retrieve(cap)
+            if frame is None or not self.sampler.decide(frame_count, frame):
+                return None
+            return frame
+        if frame_count % frame_interval != 0:
+            return None
+        return self.transform_pipeline.retrieve(cap)
+
+    def process_frame(self, frame, frame_count, model_confidence):
+        """
+        Apply transformations to a sampled frame, run inference on each variant and save the annotations.
+        """
+        transformed_images = self.apply_transformations(frame)
+
+        for key, transformed_image in transformed_images.items():
+            frame_filename = f"{self._get_video_basename()}_image{frame_count}_{key}.jpg"
+            frame_path = os.path.join(self.output_dir, 'images', frame_filename)
+
+            if not self.output_format.stores_frames:
+                cv2.imwrite(frame_path, transformed_image)
+            # success = cv2.imwrite(frame_path, transformed_image)
+            # if not success and self.config.debug:
+            #     print(f"Failed to write image to {frame_path}")
+            #     continue  # Skip further processing for this frame
+            if self.sahi_utils:
+                results = self.sahi_utils.perform_sliced_inference(transformed_image, key)
+            else:
+                results = self.vision_model.predict(transformed_image, verbose=False,
+                                                    **self.get_predict_kwargs(model_confidence))
+
+            if self.preview:
+                self.preview.submit(transformed_image, results, frame_filename)
+
+            self.output_format.save_annotations(transformed_image, frame_path, frame_filename,
+                                                results,
+                                                self.supported_classes_names, self.supported_classes_ids)
+
+    def publish_preview(self):
+        """
+        Pass the rendered debug previews to `preview_callback` when new ones are available.
+        """
+        if not self.preview or not self.preview_callback:
+            return
+        version, frames = self.preview.latest()
+        if version != self.preview_version:
+            self.preview_version = version
+            self.preview_callback(frames)
 
     def apply_transformations(self, frame):
         """
         Apply selected transformations to the frame and return a dictionary of transformed images.
+        All images are three-channel and backed by reused buffers, valid until the next frame is processed.
         """
-        transformed_images = {}
-        if 'resize' in self.transformations and self.transformations['resize']:
-            frame = self.image_processor.resize_image(frame)
-            transformed_images['resized'] = frame
-
-        if 'grayscale' in self.transformations and self.transformations['grayscale']:
-            grayscale_image = self.image_processor.convert_to_grayscale(frame)
-            transformed_images['grayscale'] = grayscale_image
-
-        if 'rotate' in self.transformations and self.transformations['rotate']:
-            rotated_image = self.image_processor.rotate_image_90_degrees(frame)
-            transformed_images['rotated'] = rotated_image
-
-        if not transformed_images:
-            transformed_images['original'] = frame
-
-        return transformed_images
+        return self.transform_pipeline.apply(frame)
 
     def _get_video_basename(self):
         """
-        Extract the basename of the video file without extension.
+        Extract the basename of the video file without extension, or the configured frame prefix.
         """
+        if self.frame_prefix:
+            return self.frame_prefix
         return os.path.splitext(os.path.basename(self.video_path))[0]
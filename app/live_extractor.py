@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import cv2
+
+from extractor import VideoFrameExtractor
+
+
+class LiveStreamExtractor(VideoFrameExtractor):
+    """
+    Extracts frames from a live stream (RTSP/UDP/HTTP URL or a named pipe) by wall-clock time.
+
+    A reader thread keeps draining the stream and hands sampled frames to the extraction loop through a
+    bounded queue, so latency cannot build up while inference runs. With `drop_oldest` the queue discards
+    its oldest frame when full; with `drop_while_busy` frames sampled while inference is running are
+    discarded. Output datasets are rotated into a new directory every `window_seconds`.
+    """
+
+    DROP_POLICIES = ('drop_oldest', 'drop_while_busy')
+
+    def __init__(self, config, stream_url, frame_rate, output_dir, model_path, class_config_path, format_factory,
+                 transformations, model_types, sahi_config=None, queue_size=4, drop_policy='drop_oldest',
+                 window_seconds=0, max_duration=None):
+        """
+        Args:
+            stream_url (str): Stream URL understood by OpenCV/FFmpeg, or the path of a named pipe.
+            frame_rate (float): Frames sampled per second of wall-clock time.
+            output_dir (str): Base directory; one sub-directory is created per time window.
+            format_factory (callable): Creates an output format instance for a given output directory.
+            queue_size (int): Maximum number of sampled frames waiting for inference.
+            drop_policy (str): 'drop_oldest' or 'drop_while_busy'.
+            window_seconds (float): Length of each output dataset window; 0 keeps a single dataset.
+            max_duration (float): Stop after this many seconds; None runs until the stream ends or `stop()`.
+        """
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy '{drop_policy}'. Choose from {self.DROP_POLICIES}.")
+        self.format_factory = format_factory
+        self.base_output_dir = output_dir
+        self.drop_policy = drop_policy
+        self.window_seconds = window_seconds
+        self.max_duration = max_duration
+        self.frame_queue = deque(maxlen=max(1, queue_size))
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.busy = threading.Event()
+        self.stream_ended = False
+        self.reader_error = None
+        self.window_index = None
+        self.window_dirs = []
+        self.stream_stats = {'sampled': 0, 'processed': 0, 'dropped': 0, 'max_latency': 0.0, 'mean_latency': 0.0}
+        # The output format is created per window once frames arrive
+        super().__init__(config, stream_url, frame_rate, output_dir, model_path, class_config_path, None,
+                         transformations, model_types, sahi_config)
+
+    def validate_source(self):
+        """
+        Accept stream URLs and existing paths such as named pipes or capture devices.
+        """
+        if '://' not in self.video_path and not os.path.exists(self.video_path):
+            raise FileNotFoundError(f"The specified stream is neither a URL nor an existing path: {self.video_path}")
+        print(f"LiveStreamExtractor initialized with stream: {self.video_path}")
+
+    def stop(self):
+        """
+        Request the reader and the extraction loop to stop.
+        """
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def _read_stream(self):
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            self.reader_error = ValueError(f"Failed to open video stream for {self.video_path}")
+        else:
+            sample_interval = 1.0 / self.frame_rate
+            next_sample_time = time.monotonic()
+            # Grab every frame so the decoder never falls behind the live edge; decode only sampled ones
+            while not self.stop_event.is_set() and cap.grab():
+                now = time.monotonic()
+                if now < next_sample_time:
+                    continue
+                next_sample_time = now + sample_interval
+                self.stream_stats['sampled'] += 1
+                if self.drop_policy == 'drop_while_busy' and self.busy.is_set():
+                    self.stream_stats['dropped'] += 1
+                    continue
+                ret, frame = cap.retrieve()
+                if not ret:
+                    continue
+                with self.condition:
+                    if len(self.frame_queue) == self.frame_queue.maxlen:
+                        self.stream_stats['dropped'] += 1  # deque discards the oldest frame
+                    self.frame_queue.append((now, frame))
+                    self.condition.notify()
+        cap.release()
+        with self.condition:
+            self.stream_ended = True
+            self.condition.notify_all()
+
+    def _next_frame(self, deadline):
+        with self.condition:
+            while True:
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.stop_event.set()
+                    return None
+                if self.frame_queue:
+                    return self.frame_queue.popleft()
+                if self.stream_ended or self.stop_event.is_set():
+                    return None
+                self.condition.wait(timeout=0.5)
+
+    def rotate_window(self, captured_at):
+        """
+        Finalize the current dataset and start a new one when the frame belongs to a new time window.
+        """
+        window_index = int((captured_at - self.start_time) // self.window_seconds) if self.window_seconds else 0
+        if window_index == self.window_index:
+            return
+        if self.output_format is not None:
+            self.output_format.finalize()
+        self.window_index = window_index
+        if self.window_seconds:
+            window_name = f"window_{window_index:04d}_{time.strftime('%Y%m%d_%H%M%S')}"
+            self.output_dir = os.path.join(self.base_output_dir, window_name)
+        os.makedirs(os.path.join(self.output_dir, 'images'), exist_ok=True)
+        self.output_format = self.format_factory(self.output_dir)
+        self.window_dirs.append(self.output_dir)
+
+    def extract_frames(self, model_confidence):
+        self.start_time = time.monotonic()
+        deadline = self.start_time + self.max_duration if self.max_duration else None
+        reader = threading.Thread(target=self._read_stream, name='live-stream-reader', daemon=True)
+        reader.start()
+
+        frame_count = 0
+        total_latency = 0.0
+        try:
+            self.start_preview()
+            while True:
+                item = self._next_frame(deadline)
+                if item is None:
+                    break
+                captured_at, frame = item
+                self.rotate_window(captured_at)
+                self.busy.set()
+                try:
+                    self.process_frame(frame, frame_count, model_confidence)
+                finally:
+                    self.busy.clear()
+                self.publish_preview()
+
+                latency = time.monotonic() - captured_at
+                total_latency += latency
+                frame_count += 1
+                self.stream_stats['processed'] = frame_count
+                self.stream_stats['max_latency'] = round(max(self.stream_stats['max_latency'], latency), 3)
+                self.stream_stats['mean_latency'] = round(total_latency / frame_count, 3)
+        finally:
+            self.stop()
+            reader.join(timeout=5)
+            if self.output_format is not None:
+                self.output_format.finalize()
+            if self.preview:
+                self.preview.close()
+                self.publish_preview()
+
+        if self.reader_error:
+            raise self.reader_error
+        print(f"Live extraction finished: {self.stream_stats}")
+
+    def _get_video_basename(self):
+        """
+        Derive a filesystem-safe name for the stream from its URL or path.
+        """
+        parsed = urlparse(self.video_path)
+        name = os.path.basename(parsed.path.rstrip('/')) or parsed.netloc or 'stream'
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', os.path.splitext(name)[0]) or 'stream'
@@ -1,12 +1,18 @@
 import os
+import json
 import uuid
 import shutil
 import streamlit as st
 from config import Config
 from extractor import VideoFrameExtractor
+from live_extractor import LiveStreamExtractor
 from formats.roboflow_format import RoboflowFormat
 from formats.cvat_format import CVATFormat
+from formats.columnar_format import ColumnarFormat
+from formats.coco_format import COCOFormat
+from formats.webdataset_format import WebDatasetFormat
 from utils.storage_manager import StorageManager
+from utils.upload_spooler import UploadSpooler
 
 
 class VideoLabelApp:
@@ -14,18 +20,23 @@ class VideoLabelApp:
         self.sahi_config = None
         self.config = Config()
         self.storage_manager = StorageManager(self.config)
-        self.format_options = {'Roboflow': RoboflowFormat, 'CVAT': CVATFormat}
+        self.upload_spooler = UploadSpooler(self.config.temp_directory, self.config.temp_max_bytes,
+                                            self.config.upload_chunk_size)
+        self.format_options = {'Roboflow': RoboflowFormat, 'CVAT': CVATFormat, 'COCO': COCOFormat,
+                               'Columnar (npz)': ColumnarFormat, 'WebDataset (tar shards)': WebDatasetFormat}
         self.setup_ui()
 
     def setup_ui(self):
         st.title(self.config.streamlit_title)
         st.sidebar.header("Storage Options")
-        self.storage_option = st.sidebar.radio("Choose storage type:", ('Local', 'Object Storage'))
+        self.storage_option = st.sidebar.radio("Choose storage type:", ('Local', 'Object Storage', 'Live Stream'))
 
         if self.storage_option == 'Object Storage':
             self.handle_object_storage()
         elif self.storage_option == 'Local':
             self.handle_local_storage()
+        elif self.storage_option == 'Live Stream':
+            self.handle_live_stream()
 
     def handle_object_storage(self):
         if not self.config.storage_use_s3:
@@ -39,12 +50,31 @@ class VideoLabelApp:
         self.uploaded_file = st.file_uploader("Upload a video file", type=['mp4', 'avi', 'mov'])
         self.continue_ui()
 
+    def handle_live_stream(self):
+        self.stream_url = st.text_input("Stream URL (rtsp://, udp://, http:// or a named pipe path)")
+        self.live_max_duration = st.number_input("Capture duration (seconds)", min_value=1.0,
+                                                 value=self.config.live_max_duration)
+        self.live_window_seconds = st.number_input("Dataset window (seconds, 0 = single dataset)", min_value=0.0,
+                                                   value=self.config.live_window_seconds)
+        drop_policies = list(LiveStreamExtractor.DROP_POLICIES)
+        self.live_drop_policy = st.sidebar.selectbox("Frame drop policy:", drop_policies,
+                                                     index=drop_policies.index(self.config.live_drop_policy))
+        self.continue_ui()
+
     def continue_ui(self):
         class_config_files = [f for f in os.listdir(self.config.object_class_directory) if f.endswith('.yaml')]
         self.class_config_selection = st.selectbox("Choose class configuration:", class_config_files)
         models = [file for file in os.listdir(self.config.models_directory) if file.endswith('.pt')]
         self.model_selection = st.selectbox("Choose a model:", models)
         self.frame_rate = st.number_input("Frame rate", value=self.config.default_frame_rate)
+        self.config.adaptive_sampling = st.checkbox("Motion-adaptive frame rate", value=self.config.adaptive_sampling)
+        if self.config.adaptive_sampling:
+            self.config.adaptive_min_rate = st.number_input("Minimum frame rate (static scenes)", min_value=0.01,
+                                                            value=self.config.adaptive_min_rate)
+            self.config.adaptive_max_rate = st.number_input("Maximum frame rate (activity)", min_value=0.01,
+                                                            value=self.config.adaptive_max_rate)
+            self.config.adaptive_frame_budget = int(st.number_input(
+                "Frame budget per video (0 = unlimited)", min_value=0, value=self.config.adaptive_frame_budget))
         transformation_options = st.multiselect('Select image transformations:',
                                                 ['Resize', 'Grayscale', 'Rotate 90 degrees'])
         self.transformations = {
@@ -53,7 +83,34 @@ class VideoLabelApp:
             'rotate': 'Rotate 90 degrees' in transformation_options
         }
         self.format_selection = st.selectbox("Choose output format:", list(self.format_options.keys()))
+        self.format_kwargs = {}
+        if self.format_selection == 'COCO':
+            self.format_kwargs['shard_size'] = int(st.number_input(
+                "Images per COCO JSON file (0 = single file)", min_value=0, value=self.config.coco_shard_size))
+        elif self.format_selection == 'WebDataset (tar shards)':
+            self.format_kwargs['max_shard_samples'] = int(st.number_input(
+                "Samples per shard", min_value=1, value=self.config.tar_shard_max_samples))
+            self.format_kwargs['max_shard_bytes'] = int(st.number_input(
+                "Shard size (MB)", min_value=1, value=self.config.tar_shard_max_bytes // (1024 * 1024))) * 1024 * 1024
+            if self.storage_option == 'Object Storage':
+                # Upload each shard as soon as it closes instead of after the run
+                self.format_kwargs['storage_manager'] = self.storage_manager
         self.model_types = st.selectbox("Choose Model Types:", ("YOLO", "RTDETR", "NAS"))
+        runtimes = ["pytorch", "onnx", "openvino"]
+        if self.model_types in VideoFrameExtractor.EXPORTABLE_MODEL_TYPES:
+            self.config.inference_runtime = st.sidebar.selectbox("Inference runtime:", runtimes,
+                                                                 index=runtimes.index(self.config.inference_runtime))
+        else:
+            self.config.inference_runtime = 'pytorch'  # NAS cannot load exported models
+        if self.config.inference_runtime != 'pytorch':
+            precisions = ["fp32", "fp16", "int8"]
+            self.config.inference_precision = st.sidebar.selectbox(
+                "Runtime precision:", precisions, index=precisions.index(self.config.inference_precision))
+            self.config.inference_dynamic_batch = st.sidebar.checkbox("Dynamic batch",
+                                                                      value=self.config.inference_dynamic_batch)
+            self.compare_runtime = st.sidebar.checkbox("Compare against PyTorch on a sample clip")
+        else:
+            self.compare_runtime = False
         self.sahi_enabled = st.sidebar.checkbox("Enable SAHI", value=self.config.sahi_enabled)
         if self.sahi_enabled:
             self.config.sahi_model_type = st.sidebar.selectbox("Model Architecture:", ["yolov8",
@@ -68,15 +125,22 @@ class VideoLabelApp:
             self.config.sahi_device = st.sidebar.selectbox("Device:", ["cpu", "cuda:0"])
             self.config.sahi_slice_size = st.sidebar.slider("SAHI slice size:", 128, 512, (256, 256))
             self.config.sahi_overlap_ratio = st.sidebar.slider("SAHI overlap ratio:", 0.1, 0.5, (0.2, 0.2))
+            self.config.sahi_adaptive = st.sidebar.checkbox("Adaptive slicing (skip empty tiles)",
+                                                            value=self.config.sahi_adaptive)
             self.sahi_config = {
                 'model_type': self.config.sahi_model_type,
                 'slice_size': self.config.sahi_slice_size,
                 'overlap_ratio': self.config.sahi_overlap_ratio,
-                'device': self.config.sahi_device  # Can be updated to use GPU if available
+                'device': self.config.sahi_device,  # Can be updated to use GPU if available
+                'adaptive': self.config.sahi_adaptive,
+                'texture_threshold': self.config.sahi_texture_threshold,
+                'motion_threshold': self.config.sahi_motion_threshold,
             }
         else:
             self.sahi_config = None
         self.model_confidence = st.number_input("Model Confidence", value=0.1)
+        self.config.imgsz_auto_tune = st.sidebar.checkbox("Auto-tune inference resolution",
+                                                          value=self.config.imgsz_auto_tune)
 
         if st.button('Extract Frames'):
             self.process_video()
@@ -86,72 +150,120 @@ class VideoLabelApp:
             self.process_local_video()
         elif self.storage_option == 'Object Storage' and self.selected_file:
             self.process_cloud_storage_video()
+        elif self.storage_option == 'Live Stream' and self.stream_url:
+            self.process_live_stream()
 
     def process_local_video(self):
-        temp_dir = 'temp'
-        os.makedirs(temp_dir, exist_ok=True)
         unique_filename = self.uploaded_file.name[:5] + "_" + str(uuid.uuid4())
         video_filename = unique_filename + ".mp4"
-        video_path = os.path.join(temp_dir, video_filename)
-        with open(video_path, 'wb') as f:
-            f.write(self.uploaded_file.getbuffer())
-        self.run_extraction(video_path, unique_filename)
+        try:
+            # Copied to disk in chunks; the spooled file is removed when extraction ends or fails
+            with self.upload_spooler.spool(self.uploaded_file, video_filename) as video_path:
+                self.run_extraction(video_path, unique_filename)
+        except RuntimeError as e:
+            if self.config.debug:
+                raise
+            st.error(str(e))
 
     def process_cloud_storage_video(self):
         """
         Handle the download of the file from cloud storage, rename it similar to the local process,
         and perform the frame extraction.
         """
-        temp_dir = 'temp'
-        os.makedirs(temp_dir, exist_ok=True)
-
         # Generate unique filename similar to the local upload handling
         file_basename = os.path.basename(self.selected_file)
         unique_filename = file_basename[:5] + "_" + str(uuid.uuid4()) + ".mp4"  # Consistent renaming
-        video_path = os.path.join(temp_dir, unique_filename)
 
-        # Download the file from S3 into the temp directory
-        self.storage_manager.download_file_from_s3(self.selected_file, video_path)
+        try:
+            # Downloads count against the same temp disk cap as uploads
+            size = self.storage_manager.object_size(self.selected_file)
+            with self.upload_spooler.reserve(unique_filename, size) as video_path:
+                # Download the file from S3 into the temp directory
+                self.storage_manager.download_file_from_s3(self.selected_file, video_path)
+
+                # Proceed to run the extraction process
+                self.run_extraction(video_path, unique_filename)
+        except RuntimeError as e:
+            if self.config.debug:
+                raise
+            st.error(str(e))
+
+    def process_live_stream(self):
+        """
+        Capture frames from the live stream for the configured duration, rotating output datasets by time window.
+        """
+        class_config_path = os.path.join(self.config.object_class_directory, self.class_config_selection)
+        specific_output_dir = os.path.join(self.config.output_directory, "live_" + str(uuid.uuid4()))
+        os.makedirs(specific_output_dir, exist_ok=True)
+
+        def format_factory(output_dir):
+            return self.format_options[self.format_selection](
+                output_dir=output_dir, sahi_enabled=self.sahi_enabled, **self.format_kwargs)
 
-        # Proceed to run the extraction process
-        self.run_extraction(video_path, unique_filename)
+        try:
+            extractor = LiveStreamExtractor(
+                self.config, self.stream_url, self.frame_rate, specific_output_dir,
+                self.model_selection, class_config_path, format_factory,
+                self.transformations, self.model_types, self.sahi_config,
+                queue_size=self.config.live_queue_size, drop_policy=self.live_drop_policy,
+                window_seconds=self.live_window_seconds, max_duration=self.live_max_duration)
+            if self.config.debug:
+                preview_placeholder = st.empty()
+                extractor.preview_callback = lambda frames: preview_placeholder.image(
+                    [image for _, image in frames], caption=[title for title, _ in frames], width=320)
+            with st.spinner(f"Capturing {self.stream_url}..."):
+                extractor.extract_frames(self.model_confidence)
+            st.json(extractor.stream_stats)
+            st.success(f"Live extraction completed into {len(extractor.window_dirs)} dataset(s).")
+        except Exception as e:
+            if self.config.debug:
+                raise
+            st.error(f"An error occurred during live extraction: {str(e)}")
 
     def run_extraction(self, video_path, unique_filename):
         """Handles the frame extraction process with conditional error handling based on debug mode."""
 
         # Prepare paths and configurations
         class_config_path = os.path.join(self.config.object_class_directory, self.class_config_selection)
-        specific_output_dir = os.path.join(self.config.output_directory, unique_filename)
-        os.makedirs(specific_output_dir, exist_ok=True)
+        dataset_name = self.sync_dataset_name(video_path)
+        specific_output_dir = self.prepare_output_dir(dataset_name or unique_filename, dataset_name is not None)
+        format_kwargs = dict(self.format_kwargs)
+        if dataset_name and 'storage_manager' in format_kwargs:
+            format_kwargs['upload_name'] = dataset_name  # Shards are uploaded under the synced dataset
         output_format_instance = self.format_options[self.format_selection](
-            output_dir=specific_output_dir, sahi_enabled=self.sahi_enabled)
+            output_dir=specific_output_dir, sahi_enabled=self.sahi_enabled, **format_kwargs)
 
         def extraction_logic():
             """Core logic for video frame extraction and post-processing."""
             extractor = VideoFrameExtractor(
                 self.config, video_path, self.frame_rate, specific_output_dir,
                 self.model_selection, class_config_path, output_format_instance,
-                self.transformations, self.model_types, self.sahi_config)
+                self.transformations, self.model_types, self.sahi_config,
+                frame_prefix=self.sync_frame_prefix(dataset_name))
+
+            if self.compare_runtime:
+                self.show_runtime_comparison(extractor, specific_output_dir)
+
+            if self.config.debug:
+                preview_placeholder = st.empty()
+                extractor.preview_callback = lambda frames: preview_placeholder.image(
+                    [image for _, image in frames], caption=[title for title, _ in frames], width=320)
 
             extractor.extract_frames(self.model_confidence)
+            self.show_run_reports(extractor)
 
             # Format-specific post-processing (e.g., zipping for CVAT format)
-            if self.format_selection == "CVAT":
-                output_format_instance.zip_and_cleanup()
+            output_format_instance.finalize()
 
             # Upload to object storage if configured
             if self.storage_option == 'Object Storage':
-                self.upload_outputs(specific_output_dir)
-
-            # Clean up the temporary video file after processing
-            if os.path.exists(video_path):
-                os.remove(video_path)
-                print(f"Deleted temporary video file: {video_path}")
+                self.upload_outputs(specific_output_dir, dataset_name)
 
             # Notify user of successful extraction
             st.success('Extraction Completed!')
 
-        # Conditionally apply try-except block based on debug mode
+        # Conditionally apply try-except block based on debug mode.
+        # The temporary video file is removed by the UploadSpooler context that created it.
         if self.config.debug:
             extraction_logic()  # No error handling in debug mode
         else:
@@ -160,27 +272,107 @@ class VideoLabelApp:
             except Exception as e:
                 st.error(f"An error occurred during frame extraction: {str(e)}")
 
-    def upload_outputs(self, directory):
+    def show_runtime_comparison(self, extractor, output_dir):
+        """Compare the exported runtime against PyTorch, save the report to the output directory and show it."""
+        report = extractor.compare_runtime(self.model_confidence)
+        with open(os.path.join(output_dir, 'runtime_comparison.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        st.subheader("Runtime comparison")
+        st.json(report)
+
+    def show_run_reports(self, extractor):
+        """Show the frame buffer, inference resolution and adaptive SAHI reports of a finished extraction."""
+        if self.config.debug:
+            st.json(extractor.memory_stats)
+        if extractor.resolution_report:
+            st.subheader("Inference resolution")
+            st.json(extractor.resolution_report)
+        if extractor.sahi_utils and extractor.sahi_utils.adaptive:
+            st.subheader("Adaptive SAHI")
+            st.json(extractor.sahi_utils.adaptive_stats)
+
+    def sync_dataset_name(self, video_path):
+        """
+        Stable dataset name for incremental sync, or None when outputs are not synced. Unlike the run
+        directory name it is the same on every re-run of a video with the same settings, so unchanged
+        objects are skipped.
+        """
+        if self.storage_option != 'Object Storage' or not self.config.storage_sync_enabled:
+            return None
+        return self.storage_manager.dataset_key(video_path, self.dataset_settings())
+
+    def sync_frame_prefix(self, dataset_name):
+        """
+        Frame name prefix of synced datasets: the source object name instead of the uuid temp video name,
+        so frame, label and metadata keys stay the same on re-runs. None keeps the temp video name.
+        """
+        if dataset_name is None:
+            return None
+        return os.path.splitext(os.path.basename(self.selected_file))[0]
+
+    def prepare_output_dir(self, name, clear=False):
+        """
+        Create the run directory. Synced runs reuse the dataset name, so leftovers of an earlier
+        failed run are removed first and never get synced.
+        """
+        directory = os.path.join(self.config.output_directory, name)
+        if clear and os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def dataset_settings(self):
+        """
+        Settings that change the extracted dataset, used to key synced datasets together with the video content.
+        """
+        config_fields = ('inference_runtime', 'inference_precision', 'inference_dynamic_batch',
+                         'inference_calibration_data', 'model_imgsz', 'imgsz_auto_tune', 'imgsz_candidates',
+                         'imgsz_tolerance', 'imgsz_calibration_frames', 'adaptive_sampling', 'adaptive_min_rate',
+                         'adaptive_max_rate', 'adaptive_frame_budget', 'adaptive_motion_threshold')
+        settings = {field: getattr(self.config, field) for field in config_fields}
+        settings.update({
+            'format': self.format_selection,
+            'format_kwargs': {key: value for key, value in self.format_kwargs.items() if key != 'storage_manager'},
+            'model': self.model_selection,
+            'model_types': self.model_types,
+            'class_config': self.class_config_selection,
+            'frame_rate': self.frame_rate,
+            'transformations': self.transformations,
+            'sahi_config': self.sahi_config,
+            'model_confidence': self.model_confidence,
+        })
+        return settings
+
+    def upload_outputs(self, directory, dataset_name=None):
         """
         Upload all files and directories from the specified directory to the S3 bucket,
         maintaining the same structure under a 'processed/' prefix in S3.
         Args:
             directory (str): The local directory path containing the files to be uploaded.
+            dataset_name (str): Stable dataset name used by incremental sync instead of the directory name.
         """
-        # Determine the base path for the directory to maintain structure in S3
-        base_path = os.path.dirname(directory)
-
-        # Walk through the directory and upload each file to S3
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                local_file_path = os.path.join(root, file)
-                # Calculate the relative path for S3 key to maintain the folder structure
-                relative_path = os.path.relpath(local_file_path, base_path)
-                s3_object_name = os.path.join("processed", relative_path)  # Use 'processed/' prefix in S3
-
-                # Upload the file to S3, preserving directory structure
-                self.storage_manager.upload_file_to_s3(local_file_path, s3_object_name)
-                print(f"Uploaded {local_file_path} to S3 as {s3_object_name}")
+        if self.config.storage_sync_enabled:
+            # Only upload objects whose content is not already in the bucket
+            stats = self.storage_manager.sync_directory(
+                directory, prefix="processed", dataset_name=dataset_name, delete=self.config.storage_sync_delete,
+                dedupe_images=self.config.storage_sync_dedupe_images,
+                manifest_path=self.config.storage_sync_manifest)
+            st.json(stats)
+        else:
+            # Determine the base path for the directory to maintain structure in S3
+            base_path = os.path.dirname(directory)
+
+            # Walk through the directory and upload each file to S3
+            for root, dirs, files in os.walk(directory):
+                for file in files:
+                    local_file_path = os.path.join(root, file)
+                    # Calculate the relative path for S3 key to maintain the folder structure
+                    relative_path = os.path.relpath(local_file_path, base_path)
+                    s3_object_name = os.path.join("processed", relative_path)  # Use 'processed/' prefix in S3
+
+                    # Upload the file to S3, preserving directory structure
+                    self.storage_manager.upload_file_to_s3(local_file_path, s3_object_name)
+                    print(f"Uploaded {local_file_path} to S3 as {s3_object_name}")
 
         # Optionally, delete the directory locally after uploading
         shutil.rmtree(directory)
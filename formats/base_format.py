@@ -10,8 +10,12 @@ class BaseFormat:
         output_dir (str): Directory where output will be stored.
         sahi_enabled (bool): Flag to enable or disable SAHI (Sliced Inference).
         sahi_utils (Optional[object]): SAHI utility object for performing sliced inference.
+        stores_frames (bool): True if the format stores the frame images itself, so the extractor
+            does not write them to the `images` directory.
     """
 
+    stores_frames = False
+
     def __init__(self, output_dir: str, sahi_enabled: bool = False, sahi_utils: Optional[object] = None):
         """
         Initializes the BaseFormat class with output directory and optional SAHI settings.
@@ -45,6 +49,32 @@ class BaseFormat:
         """
         raise NotImplementedError("Subclasses should implement this method.")
 
+    def iter_detections(self, results: Dict, supported_classes):
+        """
+        Iterate over detections of supported classes in either SAHI or Ultralytics results.
+
+        Args:
+            results: Detection results containing bounding boxes and class IDs.
+            supported_classes: List of supported class ids.
+
+        Yields:
+            Tuples of (class_id, class_id_index, confidence, (xmin, ymin, xmax, ymax)) in pixel coordinates.
+        """
+        # Check if SAHI is enabled to adapt processing of results accordingly
+        if self.sahi_enabled:
+            boxes = [(box['cls'][0], box['conf'][0], box['xyxy'][0]) for box in results['boxes']]
+        else:
+            boxes = [(box.cls[0], box.conf[0], box.xyxy[0])
+                     for result in results if hasattr(result, 'boxes') and result.boxes is not None
+                     for box in result.boxes]
+
+        for cls, conf, xyxy in boxes:
+            class_id = int(cls)
+            if class_id in supported_classes:  # Check if class_id is in the list of supported classes
+                class_id_index = supported_classes.index(class_id)  # Get index of class_id in supported_classes list
+                xmin, ymin, xmax, ymax = (float(value) for value in xyxy)
+                yield class_id, class_id_index, float(conf), (xmin, ymin, xmax, ymax)
+
     def process_results(self, results: Dict, img_dimensions, supported_classes) -> List[str]:
         """
         Generate formatted strings from detection results suitable for annotations.
@@ -61,34 +91,12 @@ class BaseFormat:
         annotations = []
         img_height, img_width = img_dimensions
 
-        # Check if SAHI is enabled to adapt processing of results accordingly
-        if self.sahi_enabled:
-            for box in results['boxes']:  # Assuming SAHI results are formatted similarly
-                class_id = int(box['cls'][0])
-                if class_id in supported_classes:  # Check if class_id is in the list of supported classes
-                    class_id_index = supported_classes.index(
-                        class_id)  # Get index of class_id in supported_classes list
-                    xmin, ymin, xmax, ymax = box['xyxy'][0]
-                    x_center = ((xmin + xmax) / 2) / img_width
-                    y_center = ((ymin + ymax) / 2) / img_height
-                    width = (xmax - xmin) / img_width
-                    height = (ymax - ymin) / img_height
-                    annotations.append(f"{class_id_index} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}")
-        else:
-            for result in results:
-                if hasattr(result, 'boxes') and result.boxes is not None:
-                    for box in result.boxes:
-                        class_id = int(box.cls[0])
-                        if class_id in supported_classes:  # Check if class_id is in the list of supported classes
-                            class_id_index = supported_classes.index(
-                                class_id)  # Get index of class_id in supported_classes list
-                            xmin, ymin, xmax, ymax = box.xyxy[0]
-                            x_center = ((xmin + xmax) / 2) / img_width
-                            y_center = ((ymin + ymax) / 2) / img_height
-                            width = (xmax - xmin) / img_width
-                            height = (ymax - ymin) / img_height
-                            annotations.append(
-                                f"{class_id_index} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}")
+        for _, class_id_index, _, (xmin, ymin, xmax, ymax) in self.iter_detections(results, supported_classes):
+            x_center = ((xmin + xmax) / 2) / img_width
+            y_center = ((ymin + ymax) / 2) / img_height
+            width = (xmax - xmin) / img_width
+            height = (ymax - ymin) / img_height
+            annotations.append(f"{class_id_index} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}")
 
         return annotations
 
@@ -110,3 +118,10 @@ class BaseFormat:
             NotImplementedError: If the method is not implemented in the subclass.
         """
         raise NotImplementedError("Subclasses should implement this method.")
+
+    def finalize(self):
+        """
+        Completes the output once all frames have been processed (e.g. flushing buffers or packaging files).
+        Formats that write everything per frame do not need to override it.
+        """
+        pass
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+from typing import List
+from formats.base_format import BaseFormat
+
+
+class COCOFormat(BaseFormat):
+    """
+    Streams annotations in COCO JSON format. Image entries are appended to the JSON file and annotation
+    entries to a side file as frames are saved, so memory stays constant regardless of the number of frames.
+    The side file is appended and the JSON closed with the categories when a shard is finalized.
+
+    Category ids are the ids of the class YAML configuration; image and annotation ids are unique across shards.
+    """
+
+    def __init__(self, output_dir: str, sahi_enabled: bool = False, shard_size: int = 0):
+        """
+        Args:
+            output_dir (str): Run directory; frames are expected in `images/` and JSON is written to the run root.
+            sahi_enabled (bool): Whether results come from SAHI sliced inference.
+            shard_size (int): Maximum number of images per JSON file. 0 writes a single `annotations.json`.
+        """
+        super().__init__(output_dir, sahi_enabled)
+        self.image_dir = os.path.join(output_dir, 'images')
+        os.makedirs(self.image_dir, exist_ok=True)
+        self.shard_size = shard_size
+        self.shard_index = 0
+        self.image_id = 0
+        self.annotation_id = 0
+        self.categories = None
+        self.shard_path = None
+        self.images_file = None
+        self.annotations_file = None
+        self.images_in_shard = 0
+        self.annotations_in_shard = 0
+
+    def _open_shard(self):
+        if self.shard_size:
+            name = f"annotations_{self.shard_index:05d}.json"
+        else:
+            name = 'annotations.json'
+        self.shard_path = os.path.join(self.output_dir, name)
+        # Written under temporary names and renamed once the JSON is complete
+        self.images_file = open(self.shard_path + '.tmp', 'w')
+        self.annotations_file = open(self.shard_path + '.annotations.tmp', 'w')
+        self.images_file.write('{"images": [\n')
+        self.images_in_shard = 0
+        self.annotations_in_shard = 0
+
+    def _close_shard(self):
+        self.annotations_file.close()
+        self.images_file.write('\n],\n"annotations": [\n')
+        with open(self.shard_path + '.annotations.tmp', 'r') as annotations_file:
+            shutil.copyfileobj(annotations_file, self.images_file)
+        self.images_file.write('\n],\n"categories": ')
+        self.images_file.write(json.dumps(self.categories or []))
+        self.images_file.write('}\n')
+        self.images_file.close()
+        os.remove(self.shard_path + '.annotations.tmp')
+        os.replace(self.shard_path + '.tmp', self.shard_path)
+        print(f"Wrote COCO annotations for {self.images_in_shard} images to {self.shard_path}")
+        self.images_file = None
+        self.annotations_file = None
+        self.shard_index += 1
+
+    def save_annotations(self, frame, frame_path: str, frame_filename: str, results, supported_classes_names: List[str],
+                         supported_classes_ids: List[str]):
+        """
+        Appends the image entry and its annotation entries to the current shard.
+        """
+        if self.categories is None:
+            self.categories = [{'id': int(cls_id), 'name': name, 'supercategory': 'none'}
+                               for cls_id, name in zip(supported_classes_ids, supported_classes_names)]
+        if self.images_file is None:
+            self._open_shard()
+
+        self.image_id += 1
+        img_height, img_width = frame.shape[:2]
+        image_entry = {'id': self.image_id, 'file_name': frame_filename, 'width': img_width, 'height': img_height}
+        self.images_file.write((',\n' if self.images_in_shard else '') + json.dumps(image_entry))
+        self.images_in_shard += 1
+
+        annotations = [
+            self.format_annotation(class_id, confidence, xyxy)
+            for class_id, _, confidence, xyxy in self.iter_detections(results, supported_classes_ids)
+        ]
+        self.write_annotations(frame_filename, annotations)
+
+        if self.shard_size and self.images_in_shard >= self.shard_size:
+            self._close_shard()
+
+    def format_annotation(self, class_id: int, confidence: float, xyxy) -> str:
+        """
+        Builds the JSON string of a COCO annotation for the current image.
+        """
+        self.annotation_id += 1
+        xmin, ymin, xmax, ymax = xyxy
+        width, height = xmax - xmin, ymax - ymin
+        annotation = {
+            'id': self.annotation_id,
+            'image_id': self.image_id,
+            'category_id': class_id,
+            'bbox': [round(xmin, 2), round(ymin, 2), round(width, 2), round(height, 2)],
+            'area': round(width * height, 2),
+            'iscrowd': 0,
+            'score': round(confidence, 4),
+        }
+        return json.dumps(annotation)
+
+    def write_annotations(self, frame_filename: str, annotations: List[str]):
+        """
+        Appends annotation JSON strings of one frame to the annotations side file of the current shard.
+        """
+        for annotation in annotations:
+            self.annotations_file.write((',\n' if self.annotations_in_shard else '') + annotation)
+            self.annotations_in_shard += 1
+
+    def finalize(self):
+        """
+        Closes the open shard, writing the categories and closing brackets.
+        """
+        if self.images_file is None and self.shard_index == 0:
+            self._open_shard()  # No frames were saved; still produce a valid, empty COCO file
+        if self.images_file is not None:
+            self._close_shard()
@@ -0,0 +1,203 @@
+import argparse
+import glob
+import os
+import re
+import cv2
+import numpy as np
+import yaml
+from typing import List
+from formats.base_format import BaseFormat
+from formats.cvat_format import CVATFormat
+from formats.roboflow_format import RoboflowFormat
+
+
+class ColumnarFormat(BaseFormat):
+    """
+    Stores every detection of a video in a columnar store of chunked `.npz` row groups instead of one
+    label file per frame. Each row group holds a frames table and a detections table; the store can be
+    converted to Roboflow or CVAT layout on demand with `convert`.
+
+    Detections columns: frame_index, variant, class_id, confidence, xyxy (pixels).
+    Frames columns: frame_index, variant, filename, width, height.
+    """
+
+    FRAME_FILENAME_PATTERN = re.compile(r'_image(\d+)_(\w+)\.\w+$')
+    CONVERTERS = {'roboflow': RoboflowFormat, 'cvat': CVATFormat}
+
+    def __init__(self, output_dir: str, sahi_enabled: bool = False, row_group_size: int = 10000):
+        super().__init__(output_dir, sahi_enabled)
+        self.image_dir = os.path.join(output_dir, 'images')
+        self.store_dir = os.path.join(output_dir, 'detections')
+        os.makedirs(self.image_dir, exist_ok=True)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.row_group_size = row_group_size
+        self.row_group_index = 0
+        self.metadata_written = False
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self.frame_rows = {'frame_index': [], 'variant': [], 'filename': [], 'width': [], 'height': []}
+        self.detection_rows = {'frame_index': [], 'variant': [], 'class_id': [], 'confidence': [], 'xyxy': []}
+
+    def save_annotations(self, frame, frame_path: str, frame_filename: str, results, supported_classes_names: List[str],
+                         supported_classes_ids: List[str]):
+        """
+        Appends the frame and its detections to the current row group, flushing it once it is full.
+        """
+        if not self.metadata_written:
+            self.write_metadata(supported_classes_names, supported_classes_ids)
+
+        frame_index, variant = self.parse_frame_filename(frame_filename)
+        img_height, img_width = frame.shape[:2]
+        self.frame_rows['frame_index'].append(frame_index)
+        self.frame_rows['variant'].append(variant)
+        self.frame_rows['filename'].append(frame_filename)
+        self.frame_rows['width'].append(img_width)
+        self.frame_rows['height'].append(img_height)
+
+        for class_id, _, confidence, xyxy in self.iter_detections(results, supported_classes_ids):
+            self.detection_rows['frame_index'].append(frame_index)
+            self.detection_rows['variant'].append(variant)
+            self.detection_rows['class_id'].append(class_id)
+            self.detection_rows['confidence'].append(confidence)
+            self.detection_rows['xyxy'].append(xyxy)
+
+        if max(len(self.frame_rows['filename']), len(self.detection_rows['class_id'])) >= self.row_group_size:
+            self.flush()
+
+    def write_metadata(self, supported_classes_names: List[str], supported_classes_ids: List[str]):
+        """
+        Writes the class mapping of the store so it can be converted without the original class YAML.
+        """
+        data = {
+            'classes': [{'id': int(cls_id), 'name': name}
+                        for cls_id, name in zip(supported_classes_ids, supported_classes_names)],
+        }
+        with open(os.path.join(self.store_dir, 'store.yaml'), 'w') as file:
+            yaml.dump(data, file)
+        self.metadata_written = True
+
+    def flush(self):
+        """
+        Writes the buffered rows as the next row group file and clears the buffers.
+        """
+        if not self.frame_rows['filename']:
+            return
+        part_path = os.path.join(self.store_dir, f"part-{self.row_group_index:05d}.npz")
+        temp_path = part_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            np.savez(
+                file,
+                frames_frame_index=np.asarray(self.frame_rows['frame_index'], dtype=np.int64),
+                frames_variant=np.asarray(self.frame_rows['variant'], dtype=str),
+                frames_filename=np.asarray(self.frame_rows['filename'], dtype=str),
+                frames_width=np.asarray(self.frame_rows['width'], dtype=np.int32),
+                frames_height=np.asarray(self.frame_rows['height'], dtype=np.int32),
+                frame_index=np.asarray(self.detection_rows['frame_index'], dtype=np.int64),
+                variant=np.asarray(self.detection_rows['variant'], dtype=str),
+                class_id=np.asarray(self.detection_rows['class_id'], dtype=np.int32),
+                confidence=np.asarray(self.detection_rows['confidence'], dtype=np.float32),
+                xyxy=np.asarray(self.detection_rows['xyxy'], dtype=np.float32).reshape(-1, 4),
+            )
+        os.replace(temp_path, part_path)  # Readers never see a partially written row group
+        self.row_group_index += 1
+        self._reset_buffers()
+
+    def finalize(self):
+        """
+        Flushes the last, partially filled row group.
+        """
+        self.flush()
+
+    @classmethod
+    def parse_frame_filename(cls, frame_filename: str):
+        """
+        Extracts the frame index and transformation variant from a filename like `video_image120_resized.jpg`.
+        """
+        match = cls.FRAME_FILENAME_PATTERN.search(frame_filename)
+        if not match:
+            return -1, os.path.splitext(frame_filename)[0]
+        return int(match.group(1)), match.group(2)
+
+    @staticmethod
+    def read_row_groups(store_dir: str):
+        """
+        Iterates over the row groups of a store in write order.
+
+        Yields:
+            dict: Column name mapped to numpy array for one row group.
+        """
+        for part_path in sorted(glob.glob(os.path.join(store_dir, 'part-*.npz'))):
+            with np.load(part_path) as part:
+                yield {name: part[name] for name in part.files}
+
+    @classmethod
+    def convert(cls, output_dir: str, target: str = 'roboflow'):
+        """
+        Converts the columnar store of a run into Roboflow or CVAT layout inside the same output directory.
+
+        Args:
+            output_dir (str): Run directory containing `images/` and `detections/`.
+            target (str): 'roboflow' or 'cvat'.
+
+        Returns:
+            int: Number of frames converted.
+        """
+        target = target.lower()
+        if target not in cls.CONVERTERS:
+            raise ValueError(f"Unsupported conversion target '{target}'. Choose from {list(cls.CONVERTERS)}.")
+        store_dir = os.path.join(output_dir, 'detections')
+        with open(os.path.join(store_dir, 'store.yaml'), 'r') as file:
+            classes = yaml.safe_load(file)['classes']
+        class_names = [cls_data['name'] for cls_data in classes]
+        class_index = {cls_data['id']: index for index, cls_data in enumerate(classes)}
+        image_dir = os.path.join(output_dir, 'images')
+
+        writer = cls.CONVERTERS[target](output_dir=output_dir, sahi_enabled=False)
+        converted = 0
+        for group in cls.read_row_groups(store_dir):
+            # Sort detections by frame key once so every frame's rows are a contiguous slice
+            keys = np.char.add(group['frame_index'].astype(str), np.char.add('/', group['variant']))
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            frame_keys = np.char.add(group['frames_frame_index'].astype(str), np.char.add('/', group['frames_variant']))
+            starts = np.searchsorted(keys, frame_keys, side='left')
+            ends = np.searchsorted(keys, frame_keys, side='right')
+
+            for row, filename in enumerate(group['frames_filename']):
+                rows = order[starts[row]:ends[row]]
+                width, height = group['frames_width'][row], group['frames_height'][row]
+                xyxy = group['xyxy'][rows]
+                centers_x = (xyxy[:, 0] + xyxy[:, 2]) / 2 / width
+                centers_y = (xyxy[:, 1] + xyxy[:, 3]) / 2 / height
+                box_widths = (xyxy[:, 2] - xyxy[:, 0]) / width
+                box_heights = (xyxy[:, 3] - xyxy[:, 1]) / height
+                annotations = [
+                    f"{class_index[int(class_id)]} {x:.6f} {y:.6f} {w:.6f} {h:.6f}"
+                    for class_id, x, y, w, h in zip(group['class_id'][rows], centers_x, centers_y,
+                                                    box_widths, box_heights)
+                ]
+                filename = str(filename)
+                if target == 'cvat':
+                    # CVAT expects PNG frames next to the label files
+                    frame = cv2.imread(os.path.join(image_dir, filename))
+                    filename = filename.replace('.jpg', '.png')
+                    cv2.imwrite(os.path.join(writer.image_dir, filename), frame)
+                writer.write_annotations(filename, annotations)
+                converted += 1
+
+        if target == 'cvat':
+            writer.create_metadata_files(class_names)
+        else:
+            writer.create_data_yaml(class_names)
+        writer.finalize()
+        return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a columnar detection store to Roboflow or CVAT layout.")
+    parser.add_argument("output_dir", help="Run directory containing images/ and detections/")
+    parser.add_argument("--to", dest="target", default="roboflow", choices=sorted(ColumnarFormat.CONVERTERS))
+    args = parser.parse_args()
+    count = ColumnarFormat.convert(args.output_dir, args.target)
+    print(f"Converted {count} frames to {args.target} layout in {args.output_dir}")
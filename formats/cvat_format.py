@@ -93,3 +93,9 @@ class CVATFormat(BaseFormat):
             os.rmdir(self.data_dir)
         except Exception as e:
             print(f"Error during zip or cleanup: {str(e)}")
+
+    def finalize(self):
+        """
+        Packages the CVAT data directory into a zip archive at the end of the run.
+        """
+        self.zip_and_cleanup()
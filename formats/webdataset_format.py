@@ -0,0 +1,152 @@
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from formats.base_format import BaseFormat
+
+
+class WebDatasetFormat(BaseFormat):
+    """
+    Writes each frame's encoded image and YOLO label directly into rolling tar shards (WebDataset layout:
+    `<key>.jpg` and `<key>.txt` members per sample) instead of individual files. Shards roll over at a
+    configurable size or sample count and are listed in `shards/index.json`. When a storage manager is
+    given, each shard is uploaded by a background worker as soon as it is closed, so inference continues
+    during the upload, and removed locally once the upload succeeded.
+    """
+
+    stores_frames = True
+
+    def __init__(self, output_dir: str, sahi_enabled: bool = False, max_shard_bytes: int = 512 * 1024 * 1024,
+                 max_shard_samples: int = 10000, storage_manager: Optional[object] = None,
+                 upload_prefix: str = 'processed', upload_name: Optional[str] = None):
+        """
+        Args:
+            output_dir (str): Run directory; shards are written to `shards/` inside it.
+            sahi_enabled (bool): Whether results come from SAHI sliced inference.
+            max_shard_bytes (int): Shard size after which a new shard is started.
+            max_shard_samples (int): Number of samples after which a new shard is started.
+            storage_manager (Optional[object]): StorageManager used to upload closed shards.
+            upload_prefix (str): Object key prefix for uploaded shards, mirroring `upload_outputs`.
+            upload_name (Optional[str]): Dataset name under the prefix, defaults to the run directory name.
+        """
+        super().__init__(output_dir, sahi_enabled)
+        self.shard_dir = os.path.join(output_dir, 'shards')
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.max_shard_bytes = max_shard_bytes
+        self.max_shard_samples = max_shard_samples
+        self.storage_manager = storage_manager
+        self.upload_prefix = upload_prefix
+        self.upload_name = upload_name or os.path.basename(os.path.normpath(output_dir))
+        self.manifest = {'classes': [], 'shards': []}
+        self.manifest_lock = threading.Lock()
+        self.upload_executor = ThreadPoolExecutor(max_workers=1) if storage_manager is not None else None
+        self.uploads = []
+        self.shard_index = 0
+        self.tar = None
+        self.shard_name = None
+        self.shard_samples = 0
+        self.first_key = None
+        self.last_key = None
+
+    def _open_shard(self):
+        self.shard_name = f"shard-{self.shard_index:06d}.tar"
+        self.tar = tarfile.open(os.path.join(self.shard_dir, self.shard_name), 'w')
+        self.shard_samples = 0
+        self.first_key = None
+
+    def _add_member(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def _close_shard(self):
+        shard_path = os.path.join(self.shard_dir, self.shard_name)
+        self.tar.close()
+        self.tar = None
+        entry = {
+            'shard': self.shard_name,
+            'samples': self.shard_samples,
+            'bytes': os.path.getsize(shard_path),
+            'first_key': self.first_key,
+            'last_key': self.last_key,
+        }
+        with self.manifest_lock:
+            self.manifest['shards'].append(entry)
+        self.write_manifest()
+        if self.upload_executor is not None:
+            object_name = '/'.join([self.upload_prefix, self.upload_name, 'shards', self.shard_name])
+            self.uploads.append(self.upload_executor.submit(self.upload_shard, shard_path, object_name, entry))
+        self.shard_index += 1
+
+    def upload_shard(self, shard_path: str, object_name: str, entry: dict):
+        """
+        Uploads a closed shard on the upload worker. Only a confirmed upload replaces the local copy;
+        failed shards stay on the local disk.
+        """
+        if not self.storage_manager.upload_file_to_s3(shard_path, object_name):
+            print(f"Keeping shard {shard_path} locally after the failed upload")
+            return
+        os.remove(shard_path)
+        with self.manifest_lock:
+            entry['object_name'] = object_name
+        self.write_manifest()
+
+    def write_manifest(self):
+        """
+        Writes the shard index listing every closed shard with its sample count, size and key range.
+        """
+        with self.manifest_lock:
+            with open(os.path.join(self.shard_dir, 'index.json'), 'w') as file:
+                json.dump(self.manifest, file, indent=2)
+
+    def save_annotations(self, frame, frame_path: str, frame_filename: str, results, supported_classes_names: List[str],
+                         supported_classes_ids: List[str]):
+        """
+        Encodes the frame and its YOLO label and appends both to the current shard.
+        """
+        if not self.manifest['classes']:
+            self.manifest['classes'] = list(supported_classes_names)
+        if self.tar is None:
+            self._open_shard()
+
+        img_dimensions = frame.shape[:2]
+        annotations = self.process_results(results, img_dimensions, supported_classes_ids)
+        # WebDataset splits the sample key from the extension at the first dot
+        key = os.path.splitext(frame_filename)[0].replace('.', '_')
+        success, encoded = cv2.imencode('.jpg', frame)
+        if not success:
+            print(f"Failed to encode frame {frame_filename}")
+            return
+        self._add_member(f"{key}.jpg", encoded.tobytes())
+        self.write_annotations(key, annotations)
+
+        self.shard_samples += 1
+        self.first_key = self.first_key or key
+        self.last_key = key
+        if self.shard_samples >= self.max_shard_samples or self.tar.offset >= self.max_shard_bytes:
+            self._close_shard()
+
+    def write_annotations(self, frame_filename: str, annotations: List[str]):
+        """
+        Adds the YOLO label of a sample to the current shard.
+        """
+        label = ''.join(annotation + "\n" for annotation in annotations)
+        self._add_member(f"{frame_filename}.txt", label.encode('utf-8'))
+
+    def finalize(self):
+        """
+        Closes (and uploads) the last shard, waits for pending uploads and writes the final shard index.
+        """
+        if self.tar is not None:
+            self._close_shard()
+        if self.upload_executor is not None:
+            for upload in self.uploads:
+                upload.result()
+            self.upload_executor.shutdown()
+        self.write_manifest()
@@ -0,0 +1,101 @@
+def box_iou(box_a, box_b):
+    """
+    Computes the intersection over union of two boxes in (xmin, ymin, xmax, ymax) format.
+
+    Parameters:
+        box_a (sequence): First box.
+        box_b (sequence): Second box.
+
+    Returns:
+        float: IoU value between 0 and 1.
+    """
+    inter_w = min(box_a[2], box_b[2]) - max(box_a[0], box_b[0])
+    inter_h = min(box_a[3], box_b[3]) - max(box_a[1], box_b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    intersection = inter_w * inter_h
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - intersection
+    return float(intersection / union) if union > 0 else 0.0
+
+
+def extract_boxes(results):
+    """
+    Flattens Ultralytics prediction results into a list of (class_id, confidence, xyxy) tuples.
+
+    Parameters:
+        results (list): Results returned by an Ultralytics model's `predict`.
+
+    Returns:
+        list: Detections as (int, float, tuple) tuples.
+    """
+    detections = []
+    for result in results:
+        if hasattr(result, 'boxes') and result.boxes is not None:
+            for box in result.boxes:
+                xmin, ymin, xmax, ymax = (float(v) for v in box.xyxy[0])
+                detections.append((int(box.cls[0]), float(box.conf[0]), (xmin, ymin, xmax, ymax)))
+    return detections
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Greedily matches candidate detections against reference detections of the same class.
+
+    Parameters:
+        reference (list): Reference detections as (class_id, confidence, xyxy) tuples.
+        candidate (list): Candidate detections as (class_id, confidence, xyxy) tuples.
+        iou_threshold (float): Minimum IoU for two boxes to count as the same object.
+
+    Returns:
+        tuple: (number of matches, list of IoU values of the matched pairs).
+    """
+    used = set()
+    matched_ious = []
+    for cls_id, _, box in sorted(candidate, key=lambda det: det[1], reverse=True):
+        best_iou, best_index = 0.0, None
+        for index, (ref_cls_id, _, ref_box) in enumerate(reference):
+            if index in used or ref_cls_id != cls_id:
+                continue
+            iou = box_iou(box, ref_box)
+            if iou > best_iou:
+                best_iou, best_index = iou, index
+        if best_index is not None and best_iou >= iou_threshold:
+            used.add(best_index)
+            matched_ious.append(best_iou)
+    return len(matched_ious), matched_ious
+
+
+def detection_agreement(reference_frames, candidate_frames, iou_threshold=0.5):
+    """
+    Summarizes how closely candidate detections reproduce the reference detections over several frames.
+
+    Parameters:
+        reference_frames (list): Per-frame reference detections.
+        candidate_frames (list): Per-frame candidate detections, aligned with `reference_frames`.
+        iou_threshold (float): Minimum IoU for two boxes to count as the same object.
+
+    Returns:
+        dict: Precision, recall, F1 and mean IoU of the matched boxes.
+    """
+    total_matches, total_reference, total_candidate = 0, 0, 0
+    all_ious = []
+    for reference, candidate in zip(reference_frames, candidate_frames):
+        matches, ious = match_detections(reference, candidate, iou_threshold)
+        total_matches += matches
+        total_reference += len(reference)
+        total_candidate += len(candidate)
+        all_ious.extend(ious)
+
+    precision = total_matches / total_candidate if total_candidate else 1.0
+    recall = total_matches / total_reference if total_reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0
+    return {
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4),
+        'mean_iou': round(sum(all_ious) / len(all_ious), 4) if all_ious else None,
+        'reference_boxes': total_reference,
+        'candidate_boxes': total_candidate,
+    }
@@ -0,0 +1,131 @@
+import json
+from collections import Counter
+
+import cv2
+
+
+class MotionAdaptiveSampler:
+    """
+    Decides which frames to sample from a cheap motion score computed on downscaled probe frames.
+
+    Probes run at the cadence of `max_rate`. The sampling rate moves between `min_rate` (static scene) and
+    `max_rate` (motion score at or above `motion_threshold`), and is lowered when needed so the total number
+    of sampled frames stays within `frame_budget` while keeping coverage until the end of the video.
+
+    Attributes:
+        decisions (list): One record per probe with frame index, time, motion score, rate and decision.
+        sampled (int): Number of frames sampled so far.
+    """
+
+    def __init__(self, video_fps, total_frames=0, min_rate=0.2, max_rate=5.0, frame_budget=0,
+                 motion_threshold=12.0, analysis_size=(64, 36)):
+        """
+        Initializes the sampler for one video.
+
+        Parameters:
+            video_fps (float): Frame rate of the video.
+            total_frames (int): Number of frames in the video, 0 if unknown.
+            min_rate (float): Frames per second sampled during static periods, default is 0.2.
+            max_rate (float): Frames per second sampled during activity, default is 5.0.
+            frame_budget (int): Maximum number of sampled frames, 0 for no budget.
+            motion_threshold (float): Mean absolute pixel difference treated as full activity, default is 12.0.
+            analysis_size (tuple): Size (width, height) of the probe images, default is (64, 36).
+        """
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("Sampling rates must satisfy 0 < min_rate <= max_rate.")
+        self.video_fps = video_fps or 30.0
+        self.total_frames = total_frames
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.frame_budget = frame_budget
+        self.motion_threshold = motion_threshold
+        self.analysis_size = analysis_size
+        self.probe_interval = max(1, int(self.video_fps / max_rate))
+        self.previous_probe = None
+        self.last_sample_time = None
+        self.sampled = 0
+        self.decisions = []
+
+    def should_probe(self, frame_count):
+        """Whether the frame should be decoded to update the motion score."""
+        return frame_count % self.probe_interval == 0
+
+    def motion_score(self, frame):
+        """
+        Returns the mean absolute difference between this probe and the previous one on a downscaled frame.
+        """
+        probe = cv2.resize(frame, self.analysis_size, interpolation=cv2.INTER_AREA)
+        if probe.ndim == 3:
+            probe = cv2.cvtColor(probe, cv2.COLOR_BGR2GRAY)
+        score = None
+        if self.previous_probe is not None:
+            score = float(cv2.absdiff(probe, self.previous_probe).mean())
+        self.previous_probe = probe
+        return score
+
+    def current_rate(self, motion, frame_count):
+        """
+        Maps the motion score to a sampling rate, respecting the remaining frame budget.
+        """
+        floor_rate = self.min_rate
+        if self.frame_budget:
+            remaining_budget = self.frame_budget - self.sampled
+            if remaining_budget <= 0:
+                return 0.0
+            if self.total_frames:
+                remaining_seconds = max(1.0 / self.video_fps, (self.total_frames - frame_count) / self.video_fps)
+                # Keep enough budget to cover the rest of the video at the floor rate
+                floor_rate = min(self.min_rate, remaining_budget / remaining_seconds)
+                if remaining_budget - floor_rate * remaining_seconds < 1:
+                    return floor_rate
+        activity = 1.0 if motion is None else min(1.0, motion / self.motion_threshold)
+        return floor_rate + (self.max_rate - floor_rate) * activity
+
+    def decide(self, frame_count, frame):
+        """
+        Records a probe and returns whether the frame should be fully processed.
+
+        Parameters:
+            frame_count (int): Index of the frame in the video.
+            frame (np.array): Decoded frame.
+
+        Returns:
+            bool: True if the frame is sampled.
+        """
+        time_seconds = frame_count / self.video_fps
+        motion = self.motion_score(frame)
+        rate = self.current_rate(motion, frame_count)
+        sample = rate > 0 and (self.last_sample_time is None
+                               or time_seconds - self.last_sample_time >= 1.0 / rate - 0.5 / self.video_fps)
+        if sample:
+            self.last_sample_time = time_seconds
+            self.sampled += 1
+        self.decisions.append({
+            'frame': frame_count,
+            'time': round(time_seconds, 3),
+            'motion': None if motion is None else round(motion, 2),
+            'rate': round(rate, 3),
+            'sampled': sample,
+        })
+        return sample
+
+    def summary(self):
+        """
+        Returns sampling totals and the number of sampled frames per minute of video.
+        """
+        per_minute = Counter(int(decision['time'] // 60) for decision in self.decisions if decision['sampled'])
+        return {
+            'probes': len(self.decisions),
+            'sampled': self.sampled,
+            'frame_budget': self.frame_budget,
+            'min_rate': self.min_rate,
+            'max_rate': self.max_rate,
+            'sampled_per_minute': [per_minute.get(minute, 0) for minute in range(max(per_minute, default=-1) + 1)],
+        }
+
+    def save(self, path):
+        """
+        Writes the summary and every probe decision to a JSON file.
+        """
+        with open(path, 'w') as file:
+            json.dump({'summary': self.summary(), 'decisions': self.decisions}, file)
@@ -1,4 +1,12 @@
+import sys
+
 import cv2
+import numpy as np
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
 
 
 class ImageProcessor:
@@ -58,3 +66,169 @@ class ImageProcessor:
             np.array: The rotated image.
         """
         return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+
+
+class BufferPool:
+    """
+    Keeps one preallocated buffer per named slot and reuses it while the requested shape stays the same.
+
+    Attributes:
+        allocations (int): Number of buffers allocated by the pool.
+        reuses (int): Number of requests served by an existing buffer.
+        pool_bytes (int): Bytes currently held by the pool.
+        peak_pool_bytes (int): Highest value `pool_bytes` has reached.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0
+        self.reuses = 0
+        self.pool_bytes = 0
+        self.peak_pool_bytes = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        Returns the buffer of the named slot, allocating it only when missing or when its shape changed.
+
+        Parameters:
+            name (str): Slot name, e.g. 'resized'.
+            shape (tuple): Required array shape.
+            dtype: Required array dtype, default is uint8.
+
+        Returns:
+            np.array: Buffer that can be passed as OpenCV `dst`.
+        """
+        buffer = self.buffers.get(name)
+        if buffer is not None and buffer.shape == tuple(shape) and buffer.dtype == dtype:
+            self.reuses += 1
+            return buffer
+        return self.adopt(name, np.empty(shape, dtype=dtype))
+
+    def peek(self, name):
+        """Returns the buffer of the named slot without counting a reuse, or None."""
+        return self.buffers.get(name)
+
+    def adopt(self, name, buffer):
+        """
+        Registers an array allocated elsewhere (e.g. by the video decoder) as the buffer of the named slot.
+
+        Parameters:
+            name (str): Slot name.
+            buffer (np.array): Array to keep for reuse.
+
+        Returns:
+            np.array: The adopted buffer.
+        """
+        previous = self.buffers.get(name)
+        if previous is not None:
+            self.pool_bytes -= previous.nbytes
+        self.buffers[name] = buffer
+        self.allocations += 1
+        self.pool_bytes += buffer.nbytes
+        self.peak_pool_bytes = max(self.peak_pool_bytes, self.pool_bytes)
+        return buffer
+
+
+class TransformPipeline:
+    """
+    Applies the selected transformations into pooled buffers so frames of the same shape do not allocate.
+
+    Every returned image is three-channel. Returned arrays are owned by the pool and are overwritten by the
+    next call, so callers must copy anything they keep beyond the current frame.
+
+    Attributes:
+        image_processor (ImageProcessor): Provides the configured output size.
+        transformations (dict): Flags for 'resize', 'grayscale' and 'rotate'.
+        pool (BufferPool): Buffers reused across frames.
+    """
+
+    # BGR -> luma -> BGR in one cv2.transform pass (same weights as cv2.COLOR_BGR2GRAY)
+    GRAY_BGR_MATRIX = np.array([[0.114, 0.587, 0.299]] * 3, dtype=np.float32)
+
+    def __init__(self, image_processor, transformations):
+        """
+        Initializes the pipeline for a fixed set of transformations.
+
+        Parameters:
+            image_processor (ImageProcessor): Processor holding the resize output size.
+            transformations (dict): Transformation flags selected by the user.
+        """
+        self.image_processor = image_processor
+        self.transformations = transformations
+        self.pool = BufferPool()
+
+    def retrieve(self, cap):
+        """
+        Decodes the frame grabbed by `cap.grab()` into the pooled frame buffer.
+
+        Parameters:
+            cap (cv2.VideoCapture): Capture positioned on a grabbed frame.
+
+        Returns:
+            np.array: The decoded frame, or None if decoding failed.
+        """
+        buffer = self.pool.peek('frame')
+        ret, frame = cap.retrieve(buffer) if buffer is not None else cap.retrieve()
+        if not ret:
+            return None
+        if frame is not buffer:
+            self.pool.adopt('frame', frame)
+        else:
+            self.pool.reuses += 1
+        return frame
+
+    def apply(self, frame):
+        """
+        Produces only the requested variants of the frame.
+
+        Parameters:
+            frame (np.array): BGR frame.
+
+        Returns:
+            dict: Variant name mapped to a pooled three-channel image.
+        """
+        transformed_images = {}
+        if self.transformations.get('resize'):
+            width, height = self.image_processor.output_size
+            resized = self.pool.get('resized', (height, width) + frame.shape[2:])
+            cv2.resize(frame, (width, height), dst=resized, interpolation=cv2.INTER_AREA)
+            frame = resized
+            transformed_images['resized'] = frame
+
+        if self.transformations.get('grayscale'):
+            if frame.ndim != 3 or frame.shape[2] != 3:
+                raise ValueError("Input image is not in expected RGB format.")
+            grayscale = self.pool.get('grayscale', frame.shape)
+            cv2.transform(frame, self.GRAY_BGR_MATRIX, dst=grayscale)
+            transformed_images['grayscale'] = grayscale
+
+        if self.transformations.get('rotate'):
+            rotated = self.pool.get('rotated', (frame.shape[1], frame.shape[0]) + frame.shape[2:])
+            cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE, dst=rotated)
+            transformed_images['rotated'] = rotated
+
+        if not transformed_images:
+            transformed_images['original'] = frame
+
+        return transformed_images
+
+    def memory_stats(self):
+        """
+        Returns allocation counters of the pool and the peak resident set size of the process.
+
+        Returns:
+            dict: Allocation and reuse counts, pool sizes and peak RSS in bytes (None if unavailable).
+        """
+        peak_rss = None
+        if resource is not None:
+            # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != 'darwin':
+                peak_rss *= 1024
+        return {
+            'allocations': self.pool.allocations,
+            'reuses': self.pool.reuses,
+            'pool_bytes': self.pool.pool_bytes,
+            'peak_pool_bytes': self.pool.peak_pool_bytes,
+            'peak_rss_bytes': peak_rss,
+        }
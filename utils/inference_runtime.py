@@ -0,0 +1,225 @@
+import hashlib
+import os
+import shutil
+import time
+
+import cv2
+
+from utils.detection_metrics import extract_boxes, detection_agreement
+
+
+class InferenceRuntime:
+    """
+    Exports PyTorch checkpoints to ONNX or OpenVINO once and serves the cached export for CPU inference.
+
+    Exports are stored next to the weights and keyed by the checkpoint hash and export options, so a
+    checkpoint is only exported again when its contents or the requested options change.
+
+    Attributes:
+        runtime (str): One of 'pytorch', 'onnx' or 'openvino'.
+        precision (str): One of 'fp32', 'fp16' or 'int8'.
+        dynamic (bool): Whether the exported graph accepts a dynamic batch and image size.
+        imgsz (int): Image size used for static exports.
+        calibration_data (str): Ultralytics dataset YAML used to calibrate OpenVINO INT8 exports.
+
+    FP16 ONNX graphs are converted explicitly with onnxconverter-common, since Ultralytics only exports
+    half precision ONNX on GPU. OpenVINO INT8 is calibrated on `calibration_data`; without it Ultralytics
+    falls back to its default dataset (downloaded on first use) instead of your own footage.
+    """
+
+    SUPPORTED_RUNTIMES = ('pytorch', 'onnx', 'openvino')
+    SUPPORTED_PRECISIONS = ('fp32', 'fp16', 'int8')
+
+    def __init__(self, runtime='pytorch', precision='fp32', dynamic=False, imgsz=640, calibration_data=None):
+        """
+        Initializes the runtime with the requested export options.
+
+        Parameters:
+            runtime (str): Inference backend to use, default is 'pytorch'.
+            precision (str): Numeric precision of the exported graph, default is 'fp32'.
+            dynamic (bool): Export with dynamic batch and image size, default is False.
+            imgsz (int): Image size for static exports, default is 640.
+            calibration_data (str): Dataset YAML for OpenVINO INT8 calibration, default is None.
+        """
+        runtime = (runtime or 'pytorch').lower()
+        precision = (precision or 'fp32').lower()
+        if runtime not in self.SUPPORTED_RUNTIMES:
+            raise ValueError(f"Unsupported inference runtime '{runtime}'. Choose from {self.SUPPORTED_RUNTIMES}.")
+        if precision not in self.SUPPORTED_PRECISIONS:
+            raise ValueError(f"Unsupported precision '{precision}'. Choose from {self.SUPPORTED_PRECISIONS}.")
+        self.runtime = runtime
+        self.precision = precision
+        self.dynamic = dynamic
+        self.imgsz = imgsz
+        self.calibration_data = calibration_data or None
+
+    @property
+    def enabled(self):
+        """Whether an exported runtime replaces the PyTorch checkpoint."""
+        return self.runtime != 'pytorch'
+
+    @staticmethod
+    def checkpoint_hash(weights_path, chunk_size=1024 * 1024):
+        """
+        Computes the SHA-256 hash of a checkpoint file without loading it into memory at once.
+
+        Parameters:
+            weights_path (str): Path to the checkpoint.
+            chunk_size (int): Number of bytes read per chunk.
+
+        Returns:
+            str: Hex digest of the file contents.
+        """
+        digest = hashlib.sha256()
+        with open(weights_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def cached_export_path(self, weights_path):
+        """
+        Returns the path where the export of the given checkpoint is cached.
+
+        Parameters:
+            weights_path (str): Path to the PyTorch checkpoint.
+
+        Returns:
+            str: Path to the cached ONNX file or OpenVINO model directory.
+        """
+        stem = os.path.splitext(os.path.basename(weights_path))[0]
+        tags = [stem, self.checkpoint_hash(weights_path)[:12], self.precision]
+        tags.append('dynamic' if self.dynamic else str(self.imgsz))
+        if self.runtime == 'openvino' and self.precision == 'int8' and self.calibration_data:
+            tags.append(hashlib.sha256(self.calibration_data.encode('utf-8')).hexdigest()[:8])
+        name = '-'.join(tags)
+        directory = os.path.dirname(weights_path)
+        if self.runtime == 'openvino':
+            # Ultralytics recognises OpenVINO models by the directory suffix
+            return os.path.join(directory, f"{name}_openvino_model")
+        return os.path.join(directory, f"{name}.onnx")
+
+    def export(self, model, weights_path):
+        """
+        Exports the model to the configured runtime unless a cached export already exists.
+
+        Parameters:
+            model: Loaded Ultralytics model created from `weights_path`.
+            weights_path (str): Path to the PyTorch checkpoint.
+
+        Returns:
+            str: Path to the exported model.
+        """
+        target_path = self.cached_export_path(weights_path)
+        if os.path.exists(target_path):
+            print(f"Using cached {self.runtime} export: {target_path}")
+            return target_path
+
+        print(f"Exporting {weights_path} to {self.runtime} ({self.precision}, dynamic={self.dynamic})...")
+        if self.runtime == 'onnx':
+            # Exported in FP32 and converted afterwards: Ultralytics ignores half=True for ONNX on CPU
+            exported_path = model.export(format='onnx', dynamic=self.dynamic, imgsz=self.imgsz, simplify=True)
+            if self.precision == 'int8':
+                self._quantize_onnx(exported_path, target_path)
+                os.remove(exported_path)
+            elif self.precision == 'fp16':
+                self._convert_onnx_fp16(exported_path, target_path)
+                os.remove(exported_path)
+            else:
+                shutil.move(exported_path, target_path)
+        else:
+            export_kwargs = {}
+            if self.precision == 'int8':
+                if self.calibration_data:
+                    export_kwargs['data'] = self.calibration_data
+                else:
+                    print("No INT8 calibration data configured; Ultralytics calibrates on its default dataset.")
+            exported_path = model.export(format='openvino', dynamic=self.dynamic, imgsz=self.imgsz,
+                                         half=self.precision == 'fp16', int8=self.precision == 'int8',
+                                         **export_kwargs)
+            shutil.move(exported_path, target_path)
+        print(f"Cached {self.runtime} export at {target_path}")
+        return target_path
+
+    @staticmethod
+    def _quantize_onnx(source_path, target_path):
+        """Applies onnxruntime dynamic INT8 weight quantization to an exported ONNX graph."""
+        try:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+        except ImportError as e:
+            raise RuntimeError(f"INT8 quantization requires onnxruntime: {str(e)}")
+        quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+
+    @staticmethod
+    def _convert_onnx_fp16(source_path, target_path):
+        """Converts the weights and activations of an exported ONNX graph to FP16, keeping FP32 inputs/outputs."""
+        try:
+            import onnx
+            from onnxconverter_common import float16
+        except ImportError as e:
+            raise RuntimeError(f"FP16 ONNX conversion requires onnx and onnxconverter-common: {str(e)}")
+        model = onnx.load(source_path)
+        onnx.save(float16.convert_float_to_float16(model, keep_io_types=True), target_path)
+
+    @staticmethod
+    def read_sample_frames(video_path, num_frames):
+        """
+        Reads frames spread evenly over the video to use as a comparison clip.
+
+        Parameters:
+            video_path (str): Path to the video file.
+            num_frames (int): Number of frames to read.
+
+        Returns:
+            list: Decoded BGR frames.
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Failed to open video stream for {video_path}")
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or num_frames
+        step = max(1, total_frames // max(1, num_frames))
+        frames = []
+        for index in range(0, total_frames, step):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+            if len(frames) >= num_frames:
+                break
+        cap.release()
+        return frames
+
+    @staticmethod
+    def compare(reference_model, candidate_model, frames, predict_kwargs):
+        """
+        Compares speed and detections of an exported model against the PyTorch model on the same frames.
+
+        Parameters:
+            reference_model: PyTorch Ultralytics model.
+            candidate_model: Exported Ultralytics model.
+            frames (list): Frames to run both models on.
+            predict_kwargs (dict): Keyword arguments passed to both `predict` calls.
+
+        Returns:
+            dict: Per-frame latency of both models, speedup and detection agreement.
+        """
+        if not frames:
+            raise ValueError("No frames available for runtime comparison.")
+
+        def run(model):
+            model.predict(frames[0], verbose=False, **predict_kwargs)  # Warm-up, excluded from timing
+            detections, start_time = [], time.perf_counter()
+            for frame in frames:
+                detections.append(extract_boxes(model.predict(frame, verbose=False, **predict_kwargs)))
+            return detections, (time.perf_counter() - start_time) * 1000 / len(frames)
+
+        reference_detections, reference_ms = run(reference_model)
+        candidate_detections, candidate_ms = run(candidate_model)
+        report = {
+            'frames': len(frames),
+            'pytorch_ms_per_frame': round(reference_ms, 2),
+            'runtime_ms_per_frame': round(candidate_ms, 2),
+            'speedup': round(reference_ms / candidate_ms, 2) if candidate_ms else None,
+        }
+        report.update(detection_agreement(reference_detections, candidate_detections))
+        return report
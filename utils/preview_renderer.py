@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class PreviewRenderer:
+    """
+    Renders debug previews of annotated frames on a background thread so inference never waits on them.
+
+    Frames are accepted at most once per `min_interval` seconds and only while the render queue has room;
+    everything else is dropped. Rendered frames are kept in a bounded ring buffer of the most recent previews.
+
+    Attributes:
+        frames (deque): Ring buffer of (title, RGB image) tuples, newest last.
+        version (int): Incremented every time a new preview is rendered.
+        submitted (int): Number of frames accepted for rendering.
+        dropped (int): Number of frames rejected by throttling or a full queue.
+    """
+
+    def __init__(self, detections_fn, class_names_map, min_interval=0.5, capacity=8, max_width=640):
+        """
+        Starts the render thread.
+
+        Parameters:
+            detections_fn (callable): Maps inference results to (class_id, class_id_index, confidence, xyxy) tuples.
+            class_names_map (dict): Class id (as string) to class name, used for box labels.
+            min_interval (float): Minimum number of seconds between accepted frames, default is 0.5.
+            capacity (int): Number of rendered previews kept, default is 8.
+            max_width (int): Previews wider than this are downscaled, default is 640.
+        """
+        self.detections_fn = detections_fn
+        self.class_names_map = class_names_map
+        self.min_interval = min_interval
+        self.max_width = max_width
+        self.frames = deque(maxlen=capacity)
+        self.version = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.last_submit_time = 0.0
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=2)
+        self.thread = threading.Thread(target=self._run, name='preview-renderer', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, results, title=''):
+        """
+        Offers a frame and its inference results for rendering without blocking.
+
+        Parameters:
+            frame (np.array): BGR or grayscale frame; copied only when accepted.
+            results: Inference results understood by `detections_fn`.
+            title (str): Caption shown with the preview.
+
+        Returns:
+            bool: True if the frame was queued, False if it was dropped.
+        """
+        now = time.monotonic()
+        if now - self.last_submit_time < self.min_interval:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait((frame.copy(), results, title))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.last_submit_time = now
+        self.submitted += 1
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, results, title = item
+            try:
+                preview = self.render(frame, results)
+            except Exception as e:
+                print(f"Failed to render debug preview for {title}: {str(e)}")
+                continue
+            with self.lock:
+                self.frames.append((title, preview))
+                self.version += 1
+
+    def render(self, frame, results):
+        """
+        Draws boxes and labels on the frame and returns a downscaled RGB image.
+        """
+        image = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB if frame.ndim == 2 else cv2.COLOR_BGR2RGB)
+        thickness = max(1, image.shape[1] // 640)
+        for class_id, _, confidence, (xmin, ymin, xmax, ymax) in self.detections_fn(results):
+            label = f"{self.class_names_map.get(str(class_id), class_id)} {confidence:.2f}"
+            top_left = (int(xmin), int(ymin))
+            cv2.rectangle(image, top_left, (int(xmax), int(ymax)), (0, 255, 0), thickness)
+            cv2.putText(image, label, (top_left[0], max(0, top_left[1] - 4)), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5 * thickness, (0, 255, 0), thickness)
+        if image.shape[1] > self.max_width:
+            scale = self.max_width / image.shape[1]
+            image = cv2.resize(image, (self.max_width, int(image.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        return image
+
+    def latest(self):
+        """
+        Returns the version and a snapshot of the ring buffer, oldest first.
+        """
+        with self.lock:
+            return self.version, list(self.frames)
+
+    def close(self, timeout=2.0):
+        """
+        Stops the render thread after the queued frames, waiting at most `timeout` seconds.
+        """
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
@@ -0,0 +1,75 @@
+import time
+
+from utils.detection_metrics import extract_boxes, detection_agreement
+
+
+class ResolutionController:
+    """
+    Chooses the inference resolution (`imgsz`) for a model and source by calibration.
+
+    Calibration runs the model on a few sampled frames at every candidate resolution and picks the smallest
+    one whose detections agree with the highest-resolution run within the tolerance (F1 of matched boxes).
+
+    Attributes:
+        candidates (list): Candidate resolutions in ascending order.
+        tolerance (float): Minimum F1 against the reference run for a resolution to be accepted.
+        iou_threshold (float): Minimum IoU for two boxes to count as the same object.
+    """
+
+    def __init__(self, candidates=(320, 480, 640, 960, 1280), tolerance=0.9, iou_threshold=0.5):
+        """
+        Initializes the controller.
+
+        Parameters:
+            candidates (tuple): Resolutions to try; the largest one is the reference.
+            tolerance (float): Minimum F1 against the reference, default is 0.9.
+            iou_threshold (float): IoU threshold for matching boxes, default is 0.5.
+        """
+        if not candidates:
+            raise ValueError("At least one candidate resolution is required.")
+        self.candidates = sorted(set(int(size) for size in candidates))
+        self.tolerance = tolerance
+        self.iou_threshold = iou_threshold
+
+    def calibrate(self, model, frames, predict_kwargs):
+        """
+        Runs the model at every candidate resolution and selects the smallest acceptable one.
+
+        Parameters:
+            model: Ultralytics model.
+            frames (list): Calibration frames.
+            predict_kwargs (dict): Keyword arguments passed to every `predict` call (without `imgsz`).
+
+        Returns:
+            dict: Chosen and reference resolution, measured speedup and per-candidate latency and agreement.
+        """
+        if not frames:
+            raise ValueError("No frames available for resolution calibration.")
+
+        measurements = {}
+        for imgsz in self.candidates:
+            model.predict(frames[0], imgsz=imgsz, verbose=False, **predict_kwargs)  # Warm-up, excluded from timing
+            detections, start_time = [], time.perf_counter()
+            for frame in frames:
+                detections.append(extract_boxes(model.predict(frame, imgsz=imgsz, verbose=False, **predict_kwargs)))
+            measurements[imgsz] = (detections, (time.perf_counter() - start_time) * 1000 / len(frames))
+
+        reference_imgsz = self.candidates[-1]
+        reference_detections, reference_ms = measurements[reference_imgsz]
+        chosen_imgsz, candidate_reports = reference_imgsz, []
+        for imgsz in self.candidates:
+            detections, ms_per_frame = measurements[imgsz]
+            agreement = detection_agreement(reference_detections, detections, self.iou_threshold)
+            candidate_reports.append({'imgsz': imgsz, 'ms_per_frame': round(ms_per_frame, 2), **agreement})
+            if agreement['f1'] >= self.tolerance and imgsz < chosen_imgsz:
+                chosen_imgsz = imgsz
+
+        chosen_ms = measurements[chosen_imgsz][1]
+        return {
+            'chosen_imgsz': chosen_imgsz,
+            'reference_imgsz': reference_imgsz,
+            'tolerance': self.tolerance,
+            'calibration_frames': len(frames),
+            'speedup': round(reference_ms / chosen_ms, 2) if chosen_ms else None,
+            'candidates': candidate_reports,
+        }
@@ -1,13 +1,12 @@
 import cv2
-import uuid
 import time
-import os
 from sahi import AutoDetectionModel
-from sahi.predict import get_sliced_prediction
+from sahi.predict import get_prediction, get_sliced_prediction
+from sahi.postprocess.combine import GreedyNMMPostprocess
+from sahi.prediction import PredictionResult
+from sahi.slicing import get_slice_bboxes
 from sahi.utils.cv import read_image_as_pil
 import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
 
 
 class SahiUtils:
@@ -17,7 +16,10 @@ class SahiUtils:
                  model_type='yolov8',
                  device='cpu',
                  slice_size=(256, 256),
-                 overlap_ratio=(0.2, 0.2)):
+                 overlap_ratio=(0.2, 0.2),
+                 adaptive=False,
+                 texture_threshold=8.0,
+                 motion_threshold=6.0):
         self.debug = debug
         self.supported_classes_map = supported_classes_map
         self.device = device  # Can be 'cpu' or 'cuda:0' for GPU
@@ -25,7 +27,14 @@ class SahiUtils:
         self.model = self.load_model(model_path)
         self.slice_size = slice_size
         self.overlap_ratio = overlap_ratio
-        self.debug_annotated_directory = str(uuid.uuid4())
+        # Adaptive slicing: only tiles that are textured, moving or contain coarse detections are inferred
+        self.adaptive = adaptive
+        self.texture_threshold = texture_threshold
+        self.motion_threshold = motion_threshold
+        self.previous_small_grays = {}  # Motion reference per transformation variant
+        self.postprocess = GreedyNMMPostprocess(match_threshold=0.5, match_metric='IOS', class_agnostic=True)
+        self.adaptive_stats = {'frames': 0, 'tiles_total': 0, 'tiles_run': 0, 'tiles_skipped': 0,
+                               'inference_seconds': 0.0, 'estimated_seconds_saved': 0.0}
 
     def load_model(self, model_path):
         """Loads a detection model based on the specified type and path."""
@@ -40,55 +49,112 @@ class SahiUtils:
         )
         return detection_model
 
-    def show_image(self, image, title="Image"):
-        """Displays a NumPy image using matplotlib."""
-        # Convert BGR to RGB for correct color
-        plt.imshow(image if len(image.shape) == 2 else cv2.cvtColor(
-            image,
-            cv2.COLOR_BGR2RGB
-        ))
-        plt.title(title)
-        plt.axis('off')  # Hide axes
-        plt.show()
+    def perform_sliced_inference(self, image, variant=None):
+        """
+        Performs object detection on an image using sliced prediction. `variant` names the transformation
+        of the frame, so adaptive slicing compares each variant only with the same variant of earlier frames.
+        """
+        pil_image = read_image_as_pil(image)
+        if self.adaptive:
+            results = self.perform_adaptive_sliced_inference(image, pil_image, variant)
+        else:
+            results = get_sliced_prediction(
+                pil_image,
+                detection_model=self.model,
+                slice_height=self.slice_size[0],
+                slice_width=self.slice_size[1],
+                overlap_height_ratio=self.overlap_ratio[0],
+                overlap_width_ratio=self.overlap_ratio[1],
+                postprocess_class_agnostic=True,
+                verbose=False
+            )
+        return self.format_predictions(results)
 
-    def show_annotated_image(self, image_path):
-        img = Image.open(image_path)
-        plt.imshow(img)
-        plt.axis('off')
-        plt.show()
+    def perform_adaptive_sliced_inference(self, image, pil_image, variant=None):
+        """
+        Runs a full-frame pass at the model's input resolution, then sliced inference only on tiles
+        that are textured, moving relative to the previous frame, or overlap a coarse detection.
+        """
+        start_time = time.perf_counter()
+        image_height, image_width = image.shape[:2]
+        coarse_result = get_prediction(pil_image, self.model)
+        coarse_predictions = [prediction.get_shifted_object_prediction()
+                              for prediction in coarse_result.object_prediction_list]
+        slice_height, slice_width = self.adaptive_slice_size(coarse_predictions)
+        tiles = get_slice_bboxes(image_height, image_width, slice_height=slice_height, slice_width=slice_width,
+                                 overlap_height_ratio=self.overlap_ratio[0], overlap_width_ratio=self.overlap_ratio[1])
+        selected_tiles = self.select_tiles(image, tiles, coarse_predictions, variant)
+        coarse_seconds = time.perf_counter() - start_time
 
-    def perform_sliced_inference(self, image):
-        """Performs object detection on an image using sliced prediction."""
-        pil_image = read_image_as_pil(image)
-        results = get_sliced_prediction(
-            pil_image,
-            detection_model=self.model,
-            slice_height=self.slice_size[0],
-            slice_width=self.slice_size[1],
-            overlap_height_ratio=self.overlap_ratio[0],
-            overlap_width_ratio=self.overlap_ratio[1],
-            postprocess_class_agnostic=True,
-            verbose=False
-        )
+        object_predictions = list(coarse_predictions)
+        tiles_start_time = time.perf_counter()
+        for xmin, ymin, xmax, ymax in selected_tiles:
+            tile_result = get_prediction(pil_image.crop((xmin, ymin, xmax, ymax)), self.model,
+                                         shift_amount=[xmin, ymin], full_shape=[image_height, image_width])
+            object_predictions.extend(prediction.get_shifted_object_prediction()
+                                      for prediction in tile_result.object_prediction_list)
+        tiles_seconds = time.perf_counter() - tiles_start_time
+
+        if object_predictions:
+            object_predictions = self.postprocess(object_predictions)
+
+        skipped = len(tiles) - len(selected_tiles)
+        seconds_per_tile = tiles_seconds / len(selected_tiles) if selected_tiles else 0.0
+        self.adaptive_stats['frames'] += 1
+        self.adaptive_stats['tiles_total'] += len(tiles)
+        self.adaptive_stats['tiles_run'] += len(selected_tiles)
+        self.adaptive_stats['tiles_skipped'] += skipped
+        self.adaptive_stats['inference_seconds'] += coarse_seconds + tiles_seconds
+        self.adaptive_stats['estimated_seconds_saved'] += max(0.0, skipped * seconds_per_tile - coarse_seconds)
         if self.debug:
-            random_value = str(uuid.uuid4())
-            # Start exporting the image
-            results.export_visuals(export_dir=f"temp/{self.debug_annotated_directory}/", file_name=random_value)
+            print(f"Adaptive SAHI: ran {len(selected_tiles)}/{len(tiles)} tiles of {slice_width}x{slice_height}")
 
-            # Wait until the file is created
-            file_path = f"temp/{self.debug_annotated_directory}/{random_value}.png"
-            timeout = 10  # Set a timeout limit of 10 seconds or more if necessary
-            start_time = time.time()
+        return PredictionResult(object_predictions, pil_image,
+                                durations_in_seconds={'prediction': coarse_seconds + tiles_seconds})
 
-            while not os.path.exists(file_path):
-                if time.time() - start_time > timeout:
-                    raise TimeoutError(f"File creation exceeded {timeout} seconds.")
-                time.sleep(0.1)  # Wait for 100 milliseconds before checking again
+    def adaptive_slice_size(self, coarse_predictions):
+        """
+        Picks a tile size of about four times the median detected object size, clamped between 128 pixels
+        and twice the configured slice size. Without coarse detections the configured size is used.
+        """
+        if not coarse_predictions:
+            return self.slice_size
+        object_sizes = sorted(max(p.bbox.maxx - p.bbox.minx, p.bbox.maxy - p.bbox.miny) for p in coarse_predictions)
+        target = 4 * object_sizes[len(object_sizes) // 2]
+        return tuple(int(min(max(128, round(target / 32) * 32), 2 * size)) for size in self.slice_size)
 
-            # Once the file exists, display it
-            self.show_annotated_image(file_path)
+    def select_tiles(self, image, tiles, coarse_predictions, variant=None, analysis_width=320):
+        """
+        Selects the tiles worth a model call using a texture map (mean absolute Laplacian), frame difference
+        against the previous frame of the same variant, and the boxes of the coarse full-frame pass, all on a
+        downscaled frame.
+        """
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        scale = min(1.0, analysis_width / gray.shape[1])
+        small_gray = cv2.resize(gray, (max(1, int(gray.shape[1] * scale)), max(1, int(gray.shape[0] * scale))),
+                                interpolation=cv2.INTER_AREA)
+        texture = np.abs(cv2.Laplacian(small_gray, cv2.CV_32F))
+        motion = None
+        previous_small_gray = self.previous_small_grays.get(variant)
+        if previous_small_gray is not None and previous_small_gray.shape == small_gray.shape:
+            motion = cv2.absdiff(small_gray, previous_small_gray)
+        self.previous_small_grays[variant] = small_gray
 
-        return self.format_predictions(results)
+        coarse_boxes = [(p.bbox.minx, p.bbox.miny, p.bbox.maxx, p.bbox.maxy) for p in coarse_predictions]
+        selected = []
+        for tile in tiles:
+            xmin, ymin, xmax, ymax = tile
+            if any(bxmin < xmax and bxmax > xmin and bymin < ymax and bymax > ymin
+                   for bxmin, bymin, bxmax, bymax in coarse_boxes):
+                selected.append(tile)
+                continue
+            region = (slice(int(ymin * scale), max(int(ymin * scale) + 1, int(ymax * scale))),
+                      slice(int(xmin * scale), max(int(xmin * scale) + 1, int(xmax * scale))))
+            if texture[region].mean() >= self.texture_threshold:
+                selected.append(tile)
+            elif motion is not None and motion[region].mean() >= self.motion_threshold:
+                selected.append(tile)
+        return selected
 
     def format_predictions(self, prediction_result):
         """Formats the predictions into a compatible format with YOLO output."""
@@ -1,5 +1,9 @@
 import boto3
+import hashlib
+import json
 import os
+import tempfile
+import threading
 from botocore.exceptions import NoCredentialsError, ClientError
 
 
@@ -8,6 +12,9 @@ class StorageManager:
     Handles interactions with S3-compatible object storage, including listing, downloading, and uploading files.
     """
 
+    # Streamlit sessions share the process, so sync manifest updates are merged under this lock
+    _manifest_lock = threading.Lock()
+
     def __init__(self, config):
         """
         Initialize the S3 client with custom endpoint and credentials from the configuration.
@@ -49,6 +56,22 @@ class StorageManager:
             print(f"Unexpected error accessing S3 bucket: {str(e)}")
             return []
 
+    def object_size(self, object_name):
+        """
+        Return the size in bytes of an object in the S3 bucket.
+        Args:
+            object_name (str): The name of the object in the S3 bucket.
+        Raises:
+            RuntimeError: If the object cannot be read.
+        """
+        try:
+            head = self.s3_client.head_object(Bucket=self.config.s3_bucket_name, Key=object_name)
+        except NoCredentialsError:
+            raise RuntimeError("Credentials not available for reading the file size.")
+        except ClientError as e:
+            raise RuntimeError(f"Error reading file size from S3: {e.response['Error']['Message']}")
+        return head['ContentLength']
+
     def download_file_from_s3(self, object_name, local_path):
         """
         Download a file from the S3 bucket to a local path. Ensures that the local directory exists.
@@ -80,10 +103,13 @@ class StorageManager:
         Args:
             local_path (str): The path to the local file to upload.
             object_name (str): The name to assign to the object in the S3 bucket.
+        Returns:
+            bool: True if the upload succeeded, False if it failed and the error was printed.
         """
         try:
             self.s3_client.upload_file(local_path, self.config.s3_bucket_name, object_name)
             print(f"Uploaded '{local_path}' to '{object_name}' in bucket '{self.config.s3_bucket_name}'")
+            return True
         except NoCredentialsError:
             print("Credentials not available for uploading the file.")
         except ClientError as e:
@@ -91,3 +117,212 @@ class StorageManager:
             print(f"Error uploading file to S3: {error_message}")
         except Exception as e:
             print(f"Unexpected error uploading file to S3: {str(e)}")
+        return False
+
+    def list_remote_etags(self, prefix):
+        """
+        List the ETags of all objects under a prefix using batched (paginated) listing requests.
+        Args:
+            prefix (str): The key prefix to list.
+        Returns:
+            Dict[str, str]: Object keys mapped to their ETag without quotes.
+        """
+        etags = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.config.s3_bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                etags[item['Key']] = item['ETag'].strip('"')
+        return etags
+
+    @staticmethod
+    def file_md5(local_path, chunk_size=1024 * 1024):
+        """
+        Compute the MD5 hex digest of a file, which equals the ETag of a single-part S3 upload.
+        """
+        digest = hashlib.md5()
+        with open(local_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _load_sync_manifest(self, manifest_path):
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as file:
+                return json.load(file)
+        return {}
+
+    def _save_sync_manifest(self, manifest_path, manifest, original):
+        """
+        Merge this sync's changes against `original` into the manifest on disk, so entries written by
+        concurrent syncs in other sessions are kept.
+        """
+        if not manifest_path:
+            return
+        updated = {key: entry for key, entry in manifest.items() if original.get(key) != entry}
+        removed = set(original) - set(manifest)
+        directory = os.path.dirname(manifest_path) or '.'
+        with StorageManager._manifest_lock:
+            current = self._load_sync_manifest(manifest_path)
+            current.update(updated)
+            for key in removed:
+                current.pop(key, None)
+            os.makedirs(directory, exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(file_descriptor, 'w') as file:
+                json.dump(current, file)
+            os.replace(temp_path, manifest_path)
+
+    def remote_etag(self, object_name):
+        """
+        Return the ETag of a single object without quotes, or None if it does not exist.
+        """
+        try:
+            head = self.s3_client.head_object(Bucket=self.config.s3_bucket_name, Key=object_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return head['ETag'].strip('"')
+
+    def _sync_file(self, local_path, object_name, remote_etags, manifest, stats, md5=None):
+        """
+        Upload a file unless the remote object already has the same content. Returns the local MD5.
+        """
+        size = os.path.getsize(local_path)
+        md5 = md5 or self.file_md5(local_path)
+        entry = manifest.get(object_name)
+        remote_etag = remote_etags.get(object_name)
+        # Multipart ETags are not MD5s, so fall back to the ETag recorded when we uploaded the object
+        recorded_match = bool(entry) and entry['md5'] == md5 and entry['etag'] == remote_etag
+        if remote_etag is not None and (remote_etag == md5 or recorded_match):
+            stats['skipped'] += 1
+            stats['bytes_skipped'] += size
+        else:
+            self.s3_client.upload_file(local_path, self.config.s3_bucket_name, object_name)
+            head = self.s3_client.head_object(Bucket=self.config.s3_bucket_name, Key=object_name)
+            remote_etag = head['ETag'].strip('"')
+            remote_etags[object_name] = remote_etag
+            stats['uploaded'] += 1
+            stats['bytes_uploaded'] += size
+        manifest[object_name] = {'md5': md5, 'etag': remote_etag, 'size': size}
+        return md5
+
+    def _sync_files(self, directory, dataset_prefix, objects_prefix, remote_etags, manifest, stats):
+        """
+        Sync every file of the directory. With `objects_prefix`, images go to content-hash keys and are
+        referenced from 'image_refs.json'. Returns the dataset keys that exist after the sync.
+        """
+        synced_keys, image_refs = set(), {}
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                local_file_path = os.path.join(root, file)
+                relative_path = os.path.relpath(local_file_path, directory).replace(os.sep, '/')
+                extension = os.path.splitext(file)[1].lower()
+                if objects_prefix and extension in ('.jpg', '.jpeg', '.png'):
+                    md5 = self.file_md5(local_file_path)
+                    object_name = objects_prefix + md5 + extension
+                    if object_name not in remote_etags:
+                        # The shared object store is not listed; look up only the hashes this dataset needs
+                        remote_etags[object_name] = self.remote_etag(object_name)
+                    self._sync_file(local_file_path, object_name, remote_etags, manifest, stats, md5)
+                    image_refs[relative_path] = object_name
+                else:
+                    object_name = dataset_prefix + relative_path
+                    self._sync_file(local_file_path, object_name, remote_etags, manifest, stats)
+                    synced_keys.add(object_name)
+
+        if image_refs:
+            refs_path = os.path.join(directory, 'image_refs.json')
+            with open(refs_path, 'w') as file:
+                json.dump(image_refs, file, indent=2, sort_keys=True)
+            refs_object_name = dataset_prefix + 'image_refs.json'
+            self._sync_file(refs_path, refs_object_name, remote_etags, manifest, stats)
+            synced_keys.add(refs_object_name)
+        return synced_keys
+
+    @staticmethod
+    def _shard_object_names(directory):
+        """
+        Object keys of tar shards that the WebDataset format uploaded itself, read from 'shards/index.json'.
+        """
+        index_path = os.path.join(directory, 'shards', 'index.json')
+        if not os.path.exists(index_path):
+            return set()
+        with open(index_path, 'r') as file:
+            shards = json.load(file).get('shards', [])
+        return {shard['object_name'] for shard in shards if 'object_name' in shard}
+
+    def _delete_stale_objects(self, directory, dataset_prefix, synced_keys, remote_etags, manifest, stats):
+        """
+        Delete remote objects under the dataset prefix that an earlier sync uploaded and that no longer
+        exist locally. Objects uploaded by other means (e.g. WebDataset shards) are never deleted.
+        """
+        protected_keys = synced_keys | self._shard_object_names(directory)
+        stale_keys = [key for key in remote_etags
+                      if key.startswith(dataset_prefix) and key in manifest and key not in protected_keys]
+        for start in range(0, len(stale_keys), 1000):  # delete_objects accepts up to 1000 keys
+            batch = stale_keys[start:start + 1000]
+            self.s3_client.delete_objects(Bucket=self.config.s3_bucket_name,
+                                          Delete={'Objects': [{'Key': key} for key in batch]})
+            for key in batch:
+                manifest.pop(key, None)
+            stats['deleted'] += len(batch)
+
+    def sync_directory(self, directory, prefix='processed', dataset_name=None, delete=False, dedupe_images=False,
+                       manifest_path=None):
+        """
+        Incrementally upload a directory, skipping objects whose content already exists remotely.
+        Keys are '<prefix>/<dataset name>/<relative path>'. Use a stable dataset name (see `dataset_key`) so
+        re-runs of the same video and settings compare against the objects of the previous run.
+        Args:
+            directory (str): The local directory to sync.
+            prefix (str): Key prefix in the bucket.
+            dataset_name (str): Name of the dataset under the prefix, defaults to the directory name.
+            delete (bool): Delete remote objects under the dataset prefix that an earlier sync uploaded
+                and that no longer exist locally.
+            dedupe_images (bool): Store images once under '<prefix>/objects/<md5><ext>' and reference them
+                from '<prefix>/<dataset name>/image_refs.json' instead of uploading 'images/', so identical
+                frames are shared across datasets. Consumers must resolve the references before training.
+            manifest_path (str): Local JSON manifest of content hashes and ETags from previous syncs.
+        Returns:
+            Dict[str, int]: Counts and bytes of uploaded, skipped and deleted objects.
+        """
+        stats = {'uploaded': 0, 'skipped': 0, 'deleted': 0, 'bytes_uploaded': 0, 'bytes_skipped': 0}
+        dataset_name = dataset_name or os.path.basename(os.path.normpath(directory))
+        dataset_prefix = '/'.join([prefix, dataset_name]) + '/'
+        objects_prefix = '/'.join([prefix, 'objects']) + '/' if dedupe_images else None
+        manifest = self._load_sync_manifest(manifest_path)
+        original_manifest = dict(manifest)
+        try:
+            remote_etags = self.list_remote_etags(dataset_prefix)
+            synced_keys = self._sync_files(directory, dataset_prefix, objects_prefix, remote_etags, manifest, stats)
+            if delete:
+                self._delete_stale_objects(directory, dataset_prefix, synced_keys, remote_etags, manifest, stats)
+        except NoCredentialsError:
+            print("Credentials not available for syncing the directory.")
+        except ClientError as e:
+            error_message = e.response['Error']['Message']
+            print(f"Error syncing directory to S3: {error_message}")
+        finally:
+            self._save_sync_manifest(manifest_path, manifest, original_manifest)
+
+        print(f"Synced '{directory}' to '{dataset_prefix}': {stats}")
+        return stats
+
+    @staticmethod
+    def dataset_key(video_path, settings, chunk_size=1024 * 1024):
+        """
+        Build a stable dataset name from the content of the source video and the extraction settings,
+        so re-running the same video with the same settings syncs into the same dataset prefix.
+        Args:
+            video_path (str): Path to the source video.
+            settings (dict): JSON-serializable settings that affect the output (format, model, rates...).
+        Returns:
+            str: '<video hash>-<settings hash>'.
+        """
+        video_digest = hashlib.sha256()
+        with open(video_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                video_digest.update(chunk)
+        settings_digest = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+        return f"{video_digest.hexdigest()[:16]}-{settings_digest.hexdigest()[:8]}"
@@ -0,0 +1,97 @@
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+
+class UploadSpooler:
+    """
+    Writes uploaded or downloaded videos to the temp directory and enforces a cap on the temp disk space
+    reserved by all sessions of the process.
+
+    Reservations are shared by every instance, since Streamlit runs each session in a thread of the same
+    process. Temp files are removed and their reservation released when the `reserve` or `spool` context exits.
+    """
+
+    _lock = threading.Lock()
+    _reserved_bytes = 0
+
+    def __init__(self, temp_dir='temp', max_total_bytes=0, chunk_size=8 * 1024 * 1024):
+        """
+        Initialize the spooler.
+        Args:
+            temp_dir (str): Directory the uploads are written to.
+            max_total_bytes (int): Cap on bytes reserved across all sessions; 0 disables the cap.
+            chunk_size (int): Number of bytes copied per write.
+        """
+        self.temp_dir = temp_dir
+        self.max_total_bytes = max_total_bytes
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def reserved_bytes(cls):
+        """
+        Bytes currently reserved by spooled files of all sessions.
+        """
+        with cls._lock:
+            return cls._reserved_bytes
+
+    def _reserve(self, size):
+        with UploadSpooler._lock:
+            if self.max_total_bytes and UploadSpooler._reserved_bytes + size > self.max_total_bytes:
+                available = max(0, self.max_total_bytes - UploadSpooler._reserved_bytes)
+                raise RuntimeError(f"Not enough temporary disk space for this video: {size} bytes requested, "
+                                   f"{available} bytes available. Please retry once other videos finish processing.")
+            UploadSpooler._reserved_bytes += size
+
+    def _release(self, size):
+        with UploadSpooler._lock:
+            UploadSpooler._reserved_bytes = max(0, UploadSpooler._reserved_bytes - size)
+
+    @staticmethod
+    def _upload_size(uploaded_file):
+        size = getattr(uploaded_file, 'size', None)
+        if size is None:
+            position = uploaded_file.tell()
+            size = uploaded_file.seek(0, os.SEEK_END)
+            uploaded_file.seek(position)
+        return size
+
+    @contextmanager
+    def reserve(self, filename, size):
+        """
+        Reserve space for a temp file of known size and yield its path, e.g. for a download.
+        The file is deleted and its reservation released when the context exits, even on errors.
+        Args:
+            filename (str): Name of the file inside the temp directory.
+            size (int): Number of bytes the file will occupy.
+        Yields:
+            str: Path of the temp file.
+        """
+        self._reserve(size)
+        path = os.path.join(self.temp_dir, filename)
+        try:
+            os.makedirs(self.temp_dir, exist_ok=True)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"Deleted temporary video file: {path}")
+            self._release(size)
+
+    @contextmanager
+    def spool(self, uploaded_file, filename):
+        """
+        Write the uploaded file to the temp directory and yield its path.
+        The file is deleted and its reservation released when the context exits, even on errors.
+        Args:
+            uploaded_file: File-like object, e.g. a Streamlit UploadedFile.
+            filename (str): Name of the spooled file inside the temp directory.
+        Yields:
+            str: Path of the spooled file.
+        """
+        with self.reserve(filename, self._upload_size(uploaded_file)) as path:
+            uploaded_file.seek(0)
+            with open(path, 'wb') as file:
+                shutil.copyfileobj(uploaded_file, file, self.chunk_size)
+            yield path